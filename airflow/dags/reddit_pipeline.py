@@ -1,7 +1,15 @@
+import configparser
 from airflow import DAG
 from airflow.operators.bash import BashOperator
 from datetime import datetime, timedelta
 
+# dbt reads posts from whichever tables load_to_redshift writes: the reddit table in upsert
+# mode, reddit_post_latest in append mode (see s3_to_redshift.py)
+parser = configparser.ConfigParser()
+parser.read('/Users/dharmatejasamudrala/reddit-etl/airflow/extraction/configuration.conf')
+LOAD_MODE = parser.get('aws_config', 'load_mode', fallback='upsert')
+POSTS_SOURCE = 'reddit_post_latest' if LOAD_MODE == 'append' else 'reddit'
+
 default_args = {
     'owner': 'airflow',
     'depends_on_past': False,
@@ -37,7 +45,8 @@ load_to_redshift = BashOperator(
 
 run_dbt = BashOperator(
     task_id='run_dbt',
-    bash_command='cd /Users/dharmatejasamudrala/reddit-etl/dbt/reddit_dbt && dbt run',
+    bash_command="cd /Users/dharmatejasamudrala/reddit-etl/dbt/reddit_dbt && "
+                 f"dbt run --vars '{{posts_source: {POSTS_SOURCE}}}'",
     dag=dag
 )
 
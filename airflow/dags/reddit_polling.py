@@ -0,0 +1,51 @@
+from airflow import DAG
+from airflow.operators.bash import BashOperator
+from datetime import datetime, timedelta
+
+# Polls each subreddit's new listing at its own cadence (see polling_scheduler.py) and
+# appends what it finds. The scheduler only polls subreddits that are due, so this runs
+# often; when nothing new was found it exits 99 and the downstream tasks are skipped.
+# dbt still runs once a day in reddit_analytics_pipeline, and reads reddit_post_latest only
+# when load_mode = append, so polling_scheduler.py refuses to run under any other load mode.
+
+default_args = {
+    'owner': 'airflow',
+    'depends_on_past': False,
+    'start_date': datetime(2025, 3, 24),
+    'email_on_failure': False,
+    'retries': 1,
+    'retry_delay': timedelta(seconds=15)
+}
+
+dag = DAG(
+    'reddit_polling_pipeline',
+    default_args=default_args,
+    schedule=timedelta(minutes=5),
+    catchup=False,
+    # The scheduler state file is read and written by one run at a time
+    max_active_runs=1
+)
+
+poll_reddit = BashOperator(
+    task_id='poll_reddit',
+    bash_command='python3 /Users/dharmatejasamudrala/reddit-etl/airflow/extraction/polling_scheduler.py',
+    do_xcom_push=True,
+    skip_on_exit_code=99,
+    dag=dag
+)
+
+load_to_s3 = BashOperator(
+    task_id='load_to_s3',
+    bash_command="python3 /Users/dharmatejasamudrala/reddit-etl/airflow/extraction/upload_to_s3.py "
+                 "{{ ti.xcom_pull(task_ids='poll_reddit') }}",
+    dag=dag
+)
+
+load_to_redshift = BashOperator(
+    task_id='load_to_redshift',
+    bash_command="python3 /Users/dharmatejasamudrala/reddit-etl/airflow/extraction/s3_to_redshift.py "
+                 "{{ ti.xcom_pull(task_ids='poll_reddit') }} append",
+    dag=dag
+)
+
+poll_reddit >> load_to_s3 >> load_to_redshift
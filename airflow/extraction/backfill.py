@@ -0,0 +1,225 @@
+import argparse
+import glob
+import importlib.util
+import logging
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import pandas as pd
+
+from near_duplicates import NearDuplicateIndex, minhash_signature, post_text
+
+"""
+Re-run the transform over historical extracts (e.g. tmp/YYYYMMDD.csv) on a process pool.
+Each file is a task: a worker streams it in row chunks through transform_data and appends
+each chunk to its output CSV, returning per-file stats. Results come back in input order,
+so the merged stats and outputs do not depend on which worker finished first.
+
+With --dedup-index, cluster ids are assigned from the persistent near-duplicate index.
+MinHash signatures are computed in parallel; only the index lookups, which depend on the
+order posts are seen in, run in the parent, file by file in date order. Without it, a
+file that has no cluster_id gets cluster_id = id (every post its own cluster), the same
+fill validate_csv.py applies, so backfilled files always carry the column.
+
+Run with `--sweep 1,2,4,8` to time the same backfill at each worker count and report the
+speedup over the first; each run starts from the same copy of the dedup index.
+"""
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('backfill')
+
+script_path = pathlib.Path(__file__).parent.resolve()
+DEFAULT_CHUNK_ROWS = 50000
+
+# The extractor's file name is not importable as a module name
+_spec = importlib.util.spec_from_file_location("extract_from_reddit", f"{script_path}/extract-from-reddit.py")
+extract_from_reddit = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(extract_from_reddit)
+
+
+def file_signatures(input_path: str) -> List[tuple]:
+    """(post id, MinHash signature) for every row of a file, in row order"""
+    df = pd.read_csv(input_path, usecols=["id", "title", "selftext"])
+    titles = df["title"].fillna("").astype(str)
+    selftexts = df["selftext"].fillna("").astype(str)
+    return [
+        (str(post_id), minhash_signature(post_text(title, selftext)))
+        for post_id, title, selftext in zip(df["id"], titles, selftexts)
+    ]
+
+
+def transform_file(
+    input_path: str,
+    output_path: str,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    cluster_ids: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """Stream one file through transform_data into output_path and return its stats"""
+    start = time.perf_counter()
+    stats = {"input_path": input_path, "output_path": output_path, "rows": 0,
+             "score_sum": 0, "score_max": None, "comments_sum": 0, "comments_max": None}
+
+    tmp_path = f"{output_path}.tmp"
+    first_chunk = True
+    for chunk in pd.read_csv(input_path, chunksize=chunk_rows):
+        transformed = extract_from_reddit.transform_data(chunk)
+        if cluster_ids is not None:
+            transformed["cluster_id"] = transformed["id"].astype(str).map(cluster_ids)
+        elif "cluster_id" not in transformed.columns:
+            transformed["cluster_id"] = transformed["id"]
+
+        transformed.to_csv(tmp_path, index=False, header=first_chunk, mode="w" if first_chunk else "a")
+        first_chunk = False
+
+        stats["rows"] += len(transformed)
+        for column, prefix in (("score", "score"), ("num_comments", "comments")):
+            if column in transformed.columns and not transformed.empty:
+                stats[f"{prefix}_sum"] += int(transformed[column].sum())
+                chunk_max = int(transformed[column].max())
+                stats[f"{prefix}_max"] = chunk_max if stats[f"{prefix}_max"] is None else max(stats[f"{prefix}_max"], chunk_max)
+
+    if first_chunk:
+        # Empty input; keep an empty output so every input has one
+        pathlib.Path(tmp_path).touch()
+    os.replace(tmp_path, output_path)
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def _transform_task(args):
+    return transform_file(*args)
+
+
+def assign_clusters(input_paths: List[str], signatures: List[List[tuple]], index_path: str) -> List[Dict[str, str]]:
+    """Assign cluster ids file by file, in input order, against the persistent index"""
+    index = NearDuplicateIndex(index_path)
+    try:
+        cluster_maps = []
+        for input_path, file_sigs in zip(input_paths, signatures):
+            cluster_maps.append({post_id: index.assign_signature(post_id, sig) for post_id, sig in file_sigs})
+            logger.info(f"Assigned clusters for {len(file_sigs)} posts in {input_path}")
+    finally:
+        index.close()
+    return cluster_maps
+
+
+def merge_stats(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-file stats; results are already in input order"""
+    rows = sum(r["rows"] for r in results)
+    score_maxes = [r["score_max"] for r in results if r["score_max"] is not None]
+    comment_maxes = [r["comments_max"] for r in results if r["comments_max"] is not None]
+    return {
+        "files": len(results),
+        "rows": rows,
+        "avg_score": sum(r["score_sum"] for r in results) / rows if rows else None,
+        "max_score": max(score_maxes) if score_maxes else None,
+        "avg_comments": sum(r["comments_sum"] for r in results) / rows if rows else None,
+        "max_comments": max(comment_maxes) if comment_maxes else None,
+        "per_file": results,
+    }
+
+
+def run_backfill(
+    input_paths: List[str],
+    output_dir: str,
+    workers: Optional[int] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    dedup_index_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """Transform every input file on a process pool and return merged stats"""
+    input_paths = sorted(input_paths)
+    pathlib.Path(output_dir).mkdir(parents=True, exist_ok=True)
+    output_paths = [str(pathlib.Path(output_dir) / pathlib.Path(p).name) for p in input_paths]
+    for input_path, output_path in zip(input_paths, output_paths):
+        if pathlib.Path(input_path).resolve() == pathlib.Path(output_path).resolve():
+            raise ValueError(f"Output would overwrite input {input_path}; choose another output directory")
+
+    workers = workers or os.cpu_count()
+    logger.info(f"Backfilling {len(input_paths)} files with {workers} workers")
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        cluster_maps = [None] * len(input_paths)
+        if dedup_index_path:
+            signatures = list(executor.map(file_signatures, input_paths))
+            cluster_maps = assign_clusters(input_paths, signatures, dedup_index_path)
+
+        tasks = [(i, o, chunk_rows, c) for i, o, c in zip(input_paths, output_paths, cluster_maps)]
+        # map yields results in submission order, keeping the merge deterministic
+        results = list(executor.map(_transform_task, tasks))
+
+    summary = merge_stats(results)
+    summary["workers"] = workers
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    summary["rows_per_second"] = round(summary["rows"] / summary["seconds"]) if summary["seconds"] else None
+    logger.info(
+        f"Backfilled {summary['rows']} rows from {summary['files']} files in {summary['seconds']}s "
+        f"({summary['rows_per_second']} rows/s)"
+    )
+    return summary
+
+
+def run_sweep(
+    input_paths: List[str],
+    output_dir: str,
+    worker_counts: List[int],
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    dedup_index_path: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Run the same backfill once per worker count and report speedup over the first"""
+    runs = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for workers in worker_counts:
+            index_path = None
+            if dedup_index_path:
+                # Every run assigns clusters against the index as it was before the sweep
+                index_path = str(pathlib.Path(work_dir) / f"index_{workers}.sqlite")
+                if os.path.exists(dedup_index_path):
+                    shutil.copyfile(dedup_index_path, index_path)
+            summary = run_backfill(input_paths, output_dir, workers, chunk_rows, index_path)
+            runs.append({"workers": workers, "rows": summary["rows"], "seconds": summary["seconds"],
+                         "rows_per_second": summary["rows_per_second"]})
+
+    baseline = runs[0]["seconds"] if runs else None
+    for run in runs:
+        run["speedup"] = round(baseline / run["seconds"], 2) if run["seconds"] else None
+        logger.info(
+            f"workers {run['workers']:>3}: {run['seconds']:>8}s  {run['rows_per_second']} rows/s  "
+            f"speedup {run['speedup']}x"
+        )
+    return runs
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Re-run the transform over historical extracts in parallel")
+    arg_parser.add_argument("output_dir", help="directory for transformed files")
+    arg_parser.add_argument("inputs", nargs="+", help="input CSV files or glob patterns, e.g. 'tmp/2025*.csv'")
+    arg_parser.add_argument("--workers", type=int, default=None, help="processes to use, defaults to CPU count")
+    arg_parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="rows per streamed chunk")
+    arg_parser.add_argument("--dedup-index", default=None, help="near-duplicate index to assign cluster_id from")
+    arg_parser.add_argument("--sweep", default=None,
+                            help="comma separated worker counts to time, e.g. 1,2,4,8; the index is not updated")
+    args = arg_parser.parse_args()
+
+    paths = [p for pattern in args.inputs for p in (glob.glob(pattern) or [pattern])]
+    try:
+        if args.sweep:
+            run_sweep(paths, args.output_dir, [int(w) for w in args.sweep.split(",")], args.chunk_rows, args.dedup_index)
+            sys.exit(0)
+        summary = run_backfill(paths, args.output_dir, args.workers, args.chunk_rows, args.dedup_index)
+    except Exception as e:
+        logger.error(f"Backfill failed: {e}")
+        sys.exit(1)
+    for key in ("files", "rows", "avg_score", "max_score", "avg_comments", "max_comments"):
+        logger.info(f"{key}: {summary[key]}")
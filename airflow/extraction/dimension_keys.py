@@ -0,0 +1,107 @@
+import logging
+from typing import Dict, Tuple
+
+from psycopg2 import sql
+
+"""
+Surrogate integer keys for the author and subreddit dimensions. The fact tables store
+author_key and subreddit_key instead of repeating the names on every row; the names live
+once in reddit_authors and reddit_subreddits.
+
+Keys are assigned set-based, inside the database: a load counts the distinct names it
+staged that the dimension does not have yet, and if there are any inserts them in one
+INSERT ... SELECT, numbered max key + ROW_NUMBER(). Nothing is read back into Python, so
+the cost follows the size of the load rather than of the dimension.
+
+Neither engine stops two loads from handing out the same key on its own: Redshift does
+not enforce PRIMARY KEY or UNIQUE, and its serializable snapshots abort a load whose read
+of a dimension another load has since written to. A transaction's snapshot is taken by its
+first statement, so each load creates the dimensions beforehand in a transaction of its own
+(create_dimensions) and starts its load transaction by locking both, always in the same
+order (lock_dimensions). They stay locked until the load commits, and concurrent loads
+queue behind each other instead of conflicting.
+"""
+
+logger = logging.getLogger('dimension_keys')
+
+# Small and joined to every fact row, so a full copy lives on every Redshift node
+sql_create_dimension = """CREATE TABLE IF NOT EXISTS {table} (
+    {key} int NOT NULL PRIMARY KEY,
+    {name} varchar(100) NOT NULL UNIQUE
+)
+DISTSTYLE ALL
+SORTKEY({key});"""
+
+# (distinct names in source, how many of them the dimension does not have)
+sql_count_new_names = """SELECT COUNT(DISTINCT s.{name}),
+       COUNT(DISTINCT CASE WHEN d.{name} IS NULL THEN s.{name} END)
+FROM {source} s
+LEFT JOIN {table} d ON d.{name} = s.{name};"""
+
+sql_insert_new_names = """INSERT INTO {table} ({key}, {name})
+SELECT m.max_key + ROW_NUMBER() OVER (ORDER BY n.{name}), n.{name}
+FROM (
+    SELECT DISTINCT s.{name}
+    FROM {source} s
+    WHERE s.{name} IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM {table} d WHERE d.{name} = s.{name})
+) n
+CROSS JOIN (SELECT COALESCE(MAX({key}), 0) AS max_key FROM {table}) m;"""
+
+
+class Dimension:
+    """A name -> surrogate key dimension table"""
+
+    def __init__(self, table: str, key_column: str, name_column: str):
+        self.table = table
+        self.key_column = key_column
+        self.name_column = name_column
+
+    def _format(self, query: str, source: str = None) -> sql.Composed:
+        return sql.SQL(query).format(
+            table=sql.Identifier(self.table),
+            key=sql.Identifier(self.key_column),
+            name=sql.Identifier(self.name_column),
+            source=sql.Identifier(source or self.table),
+        )
+
+    def create_table(self, cur):
+        cur.execute(self._format(sql_create_dimension))
+
+    def lock(self, cur):
+        """Hold the table until the caller's transaction ends"""
+        cur.execute(self._format("LOCK {table};"))
+
+    def assign_keys(self, cur, source_table: str) -> Tuple[int, int]:
+        """Give every name in source_table a key; the caller's transaction must hold lock_dimensions"""
+        cur.execute(self._format(sql_count_new_names, source_table))
+        names, new_names = cur.fetchone()
+        if new_names:
+            cur.execute(self._format(sql_insert_new_names, source_table))
+            new_names = cur.rowcount
+            logger.info(f"Added {new_names} new keys to {self.table}")
+        return names, new_names
+
+
+AUTHORS = Dimension("reddit_authors", "author_key", "author")
+SUBREDDITS = Dimension("reddit_subreddits", "subreddit_key", "subreddit")
+
+
+def create_dimensions(cur):
+    """Create the dimensions if needed; commit before the load transaction locks them"""
+    for dimension in (AUTHORS, SUBREDDITS):
+        dimension.create_table(cur)
+
+
+def lock_dimensions(cur):
+    """Lock both dimensions; must be the first statement of the load transaction"""
+    for dimension in (AUTHORS, SUBREDDITS):
+        dimension.lock(cur)
+
+
+def assign_staged_keys(cur, staging_table: str = "our_staging_table") -> Dict[str, int]:
+    """Give every author and subreddit in staging a key, under lock_dimensions"""
+    counts = {}
+    for dimension in (AUTHORS, SUBREDDITS):
+        counts[dimension.table], _ = dimension.assign_keys(cur, staging_table)
+    return counts
@@ -1,6 +1,7 @@
 import configparser
 import datetime
 import logging
+import os
 import pathlib
 import time
 from typing import List, Dict, Any, Optional
@@ -9,6 +10,10 @@ import pandas as pd
 import praw
 import numpy as np
 from praw.exceptions import PRAWException, RedditAPIException
+from extraction_checkpoint import ExtractionCheckpoint
+from near_duplicates import assign_duplicate_clusters
+from stage_handoff import write_stage_frame
+from ticker_tagger import TickerMatcher, load_symbol_dictionary, tag_tickers, DEFAULT_SYMBOLS_PATH
 
 # Set up logging
 logging.basicConfig(
@@ -17,12 +22,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger('reddit_extractor')
 
+POST_FIELDS = [
+    "id", "title", "score", "num_comments", "author", "created_utc",
+    "url", "upvote_ratio", "over_18",  "spoiler", "stickied",
+    "selftext", "subreddit"  # Added subreddit name and post content
+]
+
 # Read Configuration File
 def get_config():
     parser = configparser.ConfigParser()
     script_path = pathlib.Path(__file__).parent.resolve()
     config_file = "configuration.conf"
-    config_path = f"{script_path}/{config_file}"
+    config_path = os.environ.get("REDDIT_ETL_CONFIG", f"{script_path}/{config_file}")
     
     if not pathlib.Path(config_path).exists():
         logger.error(f"Configuration file not found: {config_path}")
@@ -62,22 +73,31 @@ def subreddit_posts(
     reddit_instance: praw.Reddit, 
     subreddit_name: str, 
     time_filter: str = "day", 
-    limit: Optional[int] = None
+    limit: Optional[int] = None,
+    after: Optional[str] = None
 ):
     """Create posts object for Reddit instance with error handling"""
     try:
         logger.info(f"Fetching posts from r/{subreddit_name} (time filter: {time_filter})")
         subreddit = reddit_instance.subreddit(subreddit_name)
-        posts = subreddit.top(time_filter=time_filter, limit=limit)
+        # Resume the listing after the last post we already have
+        params = {"after": after} if after else None
+        posts = subreddit.top(time_filter=time_filter, limit=limit, params=params)
         return posts
     except (PRAWException, RedditAPIException) as e:
         logger.error(f"Failed to fetch posts: {e}")
         raise
 
-def extract_data(posts, post_fields: List[str]) -> pd.DataFrame:
+def extract_data(
+    posts, 
+    post_fields: List[str], 
+    checkpoint: Optional[ExtractionCheckpoint] = None,
+    resumed_items: Optional[List[Dict[str, Any]]] = None,
+    throttle_seconds: float = 1
+) -> pd.DataFrame:
     """Extract Data to Pandas DataFrame with data validation"""
-    list_of_items = []
-    count = 0
+    list_of_items = list(resumed_items or [])
+    count = len(list_of_items)
     
     try:
         logger.info("Extracting post data")
@@ -85,7 +105,7 @@ def extract_data(posts, post_fields: List[str]) -> pd.DataFrame:
             # Add throttling to avoid rate limits
             if count % 100 == 0 and count > 0:
                 logger.info(f"Processed {count} posts so far")
-                time.sleep(1)
+                time.sleep(throttle_seconds)
             
             to_dict = vars(submission)
             sub_dict = {field: to_dict.get(field) for field in post_fields}
@@ -100,7 +120,12 @@ def extract_data(posts, post_fields: List[str]) -> pd.DataFrame:
             
             list_of_items.append(sub_dict)
             count += 1
+            
+            if checkpoint is not None:
+                checkpoint.add(sub_dict, submission.fullname)
         
+        if checkpoint is not None:
+            checkpoint.flush()
         logger.info(f"Finished processing {count} posts")
         
         if not list_of_items:
@@ -123,6 +148,9 @@ def extract_data(posts, post_fields: List[str]) -> pd.DataFrame:
     
     except Exception as e:
         logger.error(f"Data extraction failed: {e}")
+        if checkpoint is not None:
+            # Keep what we fetched so a retry can resume from here
+            checkpoint.flush()
         raise
 
 def transform_data(df: pd.DataFrame) -> pd.DataFrame:
@@ -179,7 +207,7 @@ def transform_data(df: pd.DataFrame) -> pd.DataFrame:
         raise
 
 def save_to_csv(df: pd.DataFrame, output_path: str = None) -> str:
-    """Save the dataframe to a CSV file"""
+    """Save the dataframe to a CSV file, or to an Arrow handoff file if output_path ends in .arrow"""
     if output_path is None:
         # Generate a default filename with timestamp
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -188,7 +216,7 @@ def save_to_csv(df: pd.DataFrame, output_path: str = None) -> str:
     try:
         logger.info(f"Saving data to {output_path}")
         
-        df.to_csv(output_path, index=False)
+        output_path = write_stage_frame(df, output_path)
         
         logger.info(f"Successfully saved data to {output_path}")
         return output_path
@@ -196,41 +224,84 @@ def save_to_csv(df: pd.DataFrame, output_path: str = None) -> str:
         logger.error(f"Failed to save data: {e}")
         raise
 
-def main(subreddit_name: str = "stocks", time_filter: str = "day", limit: Optional[int] = None, output_path: str = None):
+def process_extract(
+    raw_data: pd.DataFrame,
+    output_path: str = None,
+    dedup_index_path: str = None,
+    symbols_path: str = DEFAULT_SYMBOLS_PATH
+) -> pd.DataFrame:
+    """Transform extracted posts, assign near-duplicate clusters and tag tickers, then save both outputs"""
+    transformed_data = transform_data(raw_data)
+    
+    # Group reposts and cross-posts, matching against every post seen on earlier days
+    if dedup_index_path is None:
+        dedup_index_path = f"{pathlib.Path(output_path).parent}/near_duplicates.sqlite" if output_path else ":memory:"
+    transformed_data = assign_duplicate_clusters(transformed_data, dedup_index_path)
+    
+    # Tag mentioned tickers into a separate post -> ticker table
+    ticker_matcher = TickerMatcher(load_symbol_dictionary(symbols_path))
+    ticker_data = tag_tickers(transformed_data, ticker_matcher)
+    
+    # Save to CSV if requested
+    if output_path and not transformed_data.empty:
+        save_to_csv(transformed_data, output_path)
+        output_file = pathlib.Path(output_path)
+        tickers_path = str(output_file.with_suffix("")) + f"_tickers{output_file.suffix}"
+        save_to_csv(ticker_data, tickers_path)
+    
+    return transformed_data
+
+def main(
+    subreddit_name: str = "stocks", 
+    time_filter: str = "day", 
+    limit: Optional[int] = None, 
+    output_path: str = None,
+    checkpoint_dir: str = None,
+    dedup_index_path: str = None
+):
     """Extract Reddit data, transform, and save to CSV"""
     try:
         # Get configuration
         config = get_config()
         secret = config.get("reddit_config", "secret") 
         client_id = config.get("reddit_config", "client_id")
+        symbols_path = config.get("reddit_config", "symbols_path", fallback=DEFAULT_SYMBOLS_PATH)
+        throttle_seconds = config.getfloat("reddit_config", "throttle_seconds", fallback=1)
         
         # Define fields to extract
-        post_fields = [
-            "id", "title", "score", "num_comments", "author", "created_utc",
-            "url", "upvote_ratio", "over_18",  "spoiler", "stickied",
-            "selftext", "subreddit"  # Added subreddit name and post content
-        ]
+        post_fields = POST_FIELDS
+        
+        # Pick up where a previous failed attempt left off
+        if checkpoint_dir is None and output_path:
+            checkpoint_dir = f"{output_path}.checkpoint"
+        checkpoint = None
+        resumed_items, after = [], None
+        if checkpoint_dir:
+            run_params = {"subreddit": subreddit_name, "time_filter": time_filter, "limit": limit}
+            checkpoint = ExtractionCheckpoint(checkpoint_dir, run_params)
+            resumed_items, after = checkpoint.load()
         
         # Connect to Reddit API
         reddit_instance = api_connect(client_id, secret)
         
         # Get subreddit posts
-        posts = subreddit_posts(reddit_instance, subreddit_name, time_filter, limit)
+        remaining = None if limit is None else limit - len(resumed_items)
+        if remaining is not None and remaining <= 0:
+            posts = []
+        else:
+            posts = subreddit_posts(reddit_instance, subreddit_name, time_filter, remaining, after)
         
         # Extract data
-        raw_data = extract_data(posts, post_fields)
+        raw_data = extract_data(posts, post_fields, checkpoint, resumed_items, throttle_seconds)
         
-        # Transform data
-        transformed_data = transform_data(raw_data)
+        # Transform, cluster, tag and save
+        transformed_data = process_extract(raw_data, output_path, dedup_index_path, symbols_path)
         
         # Print summary statistics
         logger.info(f"Extracted and transformed {len(transformed_data)} posts from r/{subreddit_name}")
         
         # Display sample and stats
         logger.info(f"Sample data:\n{transformed_data.head(3)}")
-        head=list(transformed_data.iloc[0])
-        # for i in head:
-        #     print(i,type(i),"\n")
         
         if not transformed_data.empty:
             # Generate basic statistics
@@ -243,10 +314,10 @@ def main(subreddit_name: str = "stocks", time_filter: str = "day", limit: Option
                 avg_comments = transformed_data['num_comments'].mean()
                 max_comments = transformed_data['num_comments'].max()
                 logger.info(f"Average comments: {avg_comments:.2f}, Max comments: {max_comments}")
-            
-            # Save to CSV if requested
-            if output_path:
-                save_to_csv(transformed_data, output_path)
+        
+        # Run completed, the next one starts a fresh listing
+        if checkpoint is not None:
+            checkpoint.clear()
         
         return transformed_data
     
@@ -258,4 +329,6 @@ if __name__ == "__main__":
     # You can modify these parameters or add command line arguments
     current_date = datetime.now().strftime('%Y%m%d')
     output_name = current_date
-    main(subreddit_name="stocks", time_filter="week", limit=1000, output_path=f"/Users/dharmatejasamudrala/reddit-etl/tmp/{output_name}.csv")
+    data_dir = os.environ.get("REDDIT_ETL_DATA_DIR", "/Users/dharmatejasamudrala/reddit-etl/tmp")
+    # Handed off to upload_to_s3.py as Arrow; the CSV for S3 is written there
+    main(subreddit_name="stocks", time_filter="week", limit=1000, output_path=f"{data_dir}/{output_name}.arrow")
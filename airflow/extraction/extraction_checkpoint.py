@@ -0,0 +1,105 @@
+import json
+import logging
+import pathlib
+import shutil
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+"""
+Checkpoints for extract-from-reddit.py. While a listing is being fetched, records are
+appended to numbered batch files and the listing cursor (fullname of the last post
+fetched, usable as the `after` parameter) is saved alongside them. If the run fails,
+the next attempt - e.g. Airflow's retry - reloads the batches and resumes the listing
+from the cursor instead of fetching everything again.
+"""
+
+logger = logging.getLogger('reddit_extractor')
+
+STATE_FILE = "state.json"
+DATETIME_FIELDS = ("created_utc",)
+
+
+class ExtractionCheckpoint:
+    """Persist fetched records and the listing cursor for one extraction run"""
+
+    def __init__(self, directory: str, run_params: Dict[str, Any], flush_every: int = 100):
+        self.directory = pathlib.Path(directory)
+        self.run_params = run_params
+        self.flush_every = flush_every
+        self.after = None
+        self.batches = 0
+        self.record_count = 0
+        self._pending = []
+
+    def load(self) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return records already fetched and the cursor to resume from"""
+        state_path = self.directory / STATE_FILE
+        if not state_path.exists():
+            return [], None
+
+        with open(state_path) as f:
+            state = json.load(f)
+
+        if state.get("run_params") != self.run_params:
+            logger.warning(f"Checkpoint in {self.directory} is for a different run, discarding it")
+            self.clear()
+            return [], None
+
+        records = []
+        for batch in range(1, state["batches"] + 1):
+            with open(self.directory / f"batch_{batch:05d}.jsonl") as f:
+                for line in f:
+                    record = json.loads(line)
+                    for field in DATETIME_FIELDS:
+                        if record.get(field) is not None:
+                            record[field] = datetime.fromisoformat(record[field])
+                    records.append(record)
+
+        self.after = state["after"]
+        self.batches = state["batches"]
+        self.record_count = len(records)
+        logger.info(f"Resuming from checkpoint: {self.record_count} posts already fetched, after={self.after}")
+        return records, self.after
+
+    def add(self, record: Dict[str, Any], fullname: str):
+        """Queue a fetched record; flushes to disk every flush_every records"""
+        self._pending.append(record)
+        self.after = fullname
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Append queued records as a new batch file, then move the cursor past them"""
+        if not self._pending:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        batch = self.batches + 1
+        batch_path = self.directory / f"batch_{batch:05d}.jsonl"
+        with open(batch_path, "w") as f:
+            for record in self._pending:
+                f.write(json.dumps(record, default=_serialize) + "\n")
+
+        # Write the state last, so a crash mid-flush leaves the previous checkpoint intact
+        self.batches = batch
+        self.record_count += len(self._pending)
+        state = {"run_params": self.run_params, "after": self.after, "batches": self.batches}
+        tmp_path = self.directory / f"{STATE_FILE}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        tmp_path.replace(self.directory / STATE_FILE)
+
+        logger.info(f"Checkpointed {self.record_count} posts (after={self.after})")
+        self._pending = []
+
+    def clear(self):
+        """Remove the checkpoint once the run has completed"""
+        self._pending = []
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
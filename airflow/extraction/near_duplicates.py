@@ -0,0 +1,215 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from stage_handoff import read_stage_frame
+
+"""
+Near-duplicate detection for reposts and cross-posts. Each post's title + selftext is
+shingled into character 5-grams and summarised as a 128 value MinHash signature. The
+signature is split into 16 bands of 8 values; posts that share any band bucket are
+candidates, and a candidate whose signatures agree on at least 70% of values (estimated
+Jaccard similarity) puts the new post into its cluster. Posts with no such match start
+a cluster of their own, keyed by their id. So do posts with too little text to
+fingerprint (emoji-only titles, empty link posts): all of those would share one
+signature, so they are never matched or used as a match.
+
+Signatures and band buckets are kept in a SQLite index that persists across runs, so
+each day's posts are matched against the full history with a few indexed lookups per
+post rather than a scan.
+"""
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('near_duplicates')
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.7
+
+# Universal hashing (a * x + b) mod p, with p the largest prime below 2**32 so that
+# signature values fit in uint32 and a * x + b cannot overflow uint64.
+MERSENNE_PRIME = np.uint64(4294967291)
+_rng = np.random.RandomState(1)
+PERM_A = _rng.randint(1, 2**31, size=NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.randint(0, 2**32, size=NUM_PERM, dtype=np.uint64)
+SHINGLE_CHUNK = 4096
+
+# Letters and digits in any script survive; punctuation, symbols and emoji do not
+NORMALIZE_RE = re.compile(r"[\W_]+")
+
+# Fewer distinct shingles than this and a post is not fingerprinted
+MIN_SHINGLES = 5
+
+# One primary key lookup per band; a row-value IN (VALUES ...) list makes SQLite scan buckets
+CANDIDATES_QUERY = " UNION ".join(["SELECT post_id FROM buckets WHERE band = ? AND bucket = ?"] * BANDS)
+
+create_index_tables = """
+CREATE TABLE IF NOT EXISTS posts (
+    post_id TEXT PRIMARY KEY,
+    cluster_id TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    first_seen TEXT
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    post_id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, post_id)
+) WITHOUT ROWID;
+"""
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Hashes of the distinct byte shingles of normalized UTF-8 text"""
+    normalized = NORMALIZE_RE.sub(" ", text.lower()).strip()
+    # A shingle's 5 bytes pack exactly into one 40-bit integer
+    data = np.frombuffer(normalized.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    windows = len(data) - SHINGLE_SIZE + 1
+    if windows <= 0:
+        return np.empty(0, dtype=np.uint64)
+    packed = np.zeros(windows, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        packed = (packed << np.uint64(8)) | data[offset:offset + windows]
+    return np.unique(packed % MERSENNE_PRIME)
+
+
+def post_text(title, selftext) -> str:
+    """Text a post is fingerprinted on"""
+    return f"{title} {selftext}"
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of text, NUM_PERM uint32 values, or None if there is too little text"""
+    hashes = shingle_hashes(text)
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    signature = np.full(NUM_PERM, MERSENNE_PRIME, dtype=np.uint64)
+    for start in range(0, len(hashes), SHINGLE_CHUNK):
+        chunk = hashes[start:start + SHINGLE_CHUNK]
+        permuted = (PERM_A[:, None] * chunk[None, :] + PERM_B[:, None]) % MERSENNE_PRIME
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """One bucket key per band; identical bands give identical keys"""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        # 7 bytes keeps the key inside SQLite's signed 64-bit INTEGER
+        buckets.append(int.from_bytes(hashlib.blake2b(rows, digest_size=7).digest(), "big"))
+    return buckets
+
+
+class NearDuplicateIndex:
+    """Persistent MinHash LSH index of every post seen so far"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(create_index_tables)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def known_cluster(self, post_id: str) -> Optional[str]:
+        row = self.conn.execute("SELECT cluster_id FROM posts WHERE post_id = ?", (post_id,)).fetchone()
+        return row[0] if row else None
+
+    def best_match(self, signature: np.ndarray, buckets: List[int]):
+        """Return (cluster_id, similarity) of the most similar indexed post, if any"""
+        params = [value for band, bucket in enumerate(buckets) for value in (band, bucket)]
+        candidates = self.conn.execute(
+            f"SELECT p.cluster_id, p.signature FROM posts p WHERE p.post_id IN ({CANDIDATES_QUERY})",
+            params,
+        ).fetchall()
+
+        best_cluster, best_similarity = None, 0.0
+        for cluster_id, blob in candidates:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity > best_similarity:
+                best_cluster, best_similarity = cluster_id, similarity
+        return best_cluster, best_similarity
+
+    def add(self, post_id: str, cluster_id: str, signature: Optional[np.ndarray], buckets: List[int]):
+        self.conn.execute(
+            "INSERT INTO posts (post_id, cluster_id, signature, first_seen) VALUES (?, ?, ?, ?)",
+            (post_id, cluster_id, b"" if signature is None else signature.tobytes(), datetime.now().isoformat()),
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO buckets (band, bucket, post_id) VALUES (?, ?, ?)",
+            [(band, bucket, post_id) for band, bucket in enumerate(buckets)],
+        )
+
+    def assign(self, post_id: str, text: str) -> str:
+        """Cluster id for a post, indexing it if it has not been seen before"""
+        cluster_id = self.known_cluster(post_id)
+        if cluster_id is not None:
+            return cluster_id
+        return self.assign_signature(post_id, minhash_signature(text))
+
+    def assign_signature(self, post_id: str, signature: Optional[np.ndarray]) -> str:
+        """Like assign, for a signature computed elsewhere (e.g. in a worker process)"""
+        cluster_id = self.known_cluster(post_id)
+        if cluster_id is not None:
+            return cluster_id
+
+        if signature is None:
+            # Too little text to compare; no buckets, so nothing is ever matched to it
+            self.add(post_id, post_id, None, [])
+            return post_id
+
+        buckets = band_buckets(signature)
+        match, similarity = self.best_match(signature, buckets)
+        cluster_id = match if similarity >= SIMILARITY_THRESHOLD else post_id
+        self.add(post_id, cluster_id, signature, buckets)
+        return cluster_id
+
+
+def assign_duplicate_clusters(df: pd.DataFrame, index_path: str = ":memory:") -> pd.DataFrame:
+    """Add a cluster_id column grouping near-duplicate posts, matching against the index history"""
+    logger.info(f"Assigning near-duplicate clusters using index {index_path}")
+    clustered_df = df.copy()
+    if clustered_df.empty:
+        clustered_df["cluster_id"] = pd.Series(dtype=str)
+        return clustered_df
+
+    titles = clustered_df["title"].fillna("").astype(str) if "title" in clustered_df.columns else [""] * len(clustered_df)
+    selftexts = clustered_df["selftext"].fillna("").astype(str) if "selftext" in clustered_df.columns else [""] * len(clustered_df)
+
+    index = NearDuplicateIndex(index_path)
+    try:
+        cluster_ids = [
+            index.assign(str(post_id), post_text(title, selftext))
+            for post_id, title, selftext in zip(clustered_df["id"], titles, selftexts)
+        ]
+    finally:
+        index.close()
+
+    clustered_df["cluster_id"] = cluster_ids
+    duplicates = int((clustered_df["cluster_id"] != clustered_df["id"].astype(str)).sum())
+    logger.info(f"{duplicates} of {len(clustered_df)} posts are near-duplicates of another post")
+    return clustered_df
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python near_duplicates.py <index.sqlite> <input.csv|input.arrow> [...]")
+        sys.exit(1)
+    # Feed historical files through the index in order, e.g. to backfill it
+    for input_path in sys.argv[2:]:
+        assign_duplicate_clusters(read_stage_frame(input_path), sys.argv[1])
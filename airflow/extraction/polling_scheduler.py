@@ -0,0 +1,444 @@
+import argparse
+import importlib.util
+import json
+import logging
+import math
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import pandas as pd
+
+from run_report import write_run_report
+
+"""
+Incremental polling of `new` listings, one cadence per subreddit. The daily top(week) pull
+misses posts on busy subreddits, whose listing overflows the 1000 item cap, and mostly
+refetches the same posts on quiet ones. Instead, each subreddit is polled for posts newer
+than the last one we saw, as often as its post rate needs:
+
+  - rate: an exponentially weighted moving average of new posts per hour
+  - churn: the share of each fetched listing that was new; close to 1 means the
+    listing is turning over about as fast as we read it
+  - interval: the time expected to accumulate TARGET_NEW_PER_POLL new posts, clamped
+    between the configured min and max. A poll that never reaches an already seen
+    post may have missed some (a gap), so the next interval is at least halved.
+
+All subreddits share an hourly API call budget. If their intervals would exceed it, every
+interval is stretched by the same factor, and when more subreddits are due than calls are
+left, those with the largest expected backlog (rate x time since last poll) go first. So
+that a busy subreddit cannot starve the others, any subreddit left waiting for longer than
+the minimum interval past its poll time goes ahead of them, longest wait first.
+
+State is kept in a JSON file between runs. Configure under [polling_config]:
+subreddits (comma separated), api_budget_per_hour, min_interval_minutes,
+max_interval_minutes and state_path.
+
+Run by the reddit_polling DAG every few minutes; only subreddits that are due are polled.
+Requires load_mode = append, the mode the daily load and dbt must then share.
+The output name (YYYYMMDD_HHMM) is printed as the last line for the downstream tasks, or the
+script exits with status 99, which Airflow treats as skipped, when nothing new was found.
+
+Run `python polling_scheduler.py --simulate` to replay the scheduler against simulated
+subreddits (by default 300, 10 and 0.5 posts/hour, Poisson arrivals, with a day of
+history before the first run) for 48 hours of 5 minute DAG runs. It reports API calls
+per hour, gaps, and coverage: how many of the posts created during the simulation were
+fetched. Posts still waiting for a subreddit's next poll at the end count as missed too,
+and are also reported as pending.
+"""
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('polling_scheduler')
+
+script_path = pathlib.Path(__file__).parent.resolve()
+
+# The extractor's file name is not importable as a module name
+_spec = importlib.util.spec_from_file_location("extract_from_reddit", f"{script_path}/extract-from-reddit.py")
+extract_from_reddit = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(extract_from_reddit)
+
+DEFAULT_STATE_PATH = os.environ.get(
+    "REDDIT_ETL_POLL_STATE", str(script_path.parents[1] / "tmp" / "polling_state.json")
+)
+DEFAULT_BUDGET_PER_HOUR = 600
+DEFAULT_MIN_INTERVAL_MINUTES = 5
+DEFAULT_MAX_INTERVAL_MINUTES = 720
+DEFAULT_SIMULATED_RATES = {"hot": 300.0, "warm": 10.0, "cold": 0.5}
+SIMULATED_HISTORY_HOURS = 24
+
+# Reddit serves listings 100 items per request and stops at 1000 items
+PAGE_SIZE = 100
+MAX_POLL_ITEMS = 1000
+# Half a page: one request per poll, with headroom before the listing overflows
+TARGET_NEW_PER_POLL = 50
+RATE_ALPHA = 0.3
+# Ids kept to recognise already seen posts, in case the newest one was deleted
+SEEN_IDS_KEPT = 300
+NOTHING_NEW_EXIT_CODE = 99
+
+
+class PollingScheduler:
+    """Per-subreddit poll intervals and the shared API budget, persisted as JSON"""
+
+    def __init__(
+        self,
+        state_path: str,
+        subreddits: List[str],
+        budget_per_hour: int = DEFAULT_BUDGET_PER_HOUR,
+        min_interval: float = DEFAULT_MIN_INTERVAL_MINUTES * 60,
+        max_interval: float = DEFAULT_MAX_INTERVAL_MINUTES * 60
+    ):
+        self.state_path = pathlib.Path(state_path)
+        self.subreddits = subreddits
+        self.budget_per_hour = budget_per_hour
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.state = {"subreddits": {}, "api_calls": []}
+
+    def load(self):
+        if self.state_path.exists():
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+        for name in self.subreddits:
+            self.state["subreddits"].setdefault(name, {
+                "rate_per_hour": None,
+                "churn": None,
+                "interval_seconds": self.min_interval,
+                "last_polled_at": None,
+                "next_poll_at": 0,
+                "newest_created_utc": None,
+                "seen_ids": [],
+                "polls": 0,
+                "gaps": 0,
+            })
+        return self.state
+
+    def save(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def calls_remaining(self, now: float) -> int:
+        """API calls left in the budget for the hour ending now"""
+        self.state["api_calls"] = [c for c in self.state["api_calls"] if c[0] > now - 3600]
+        return self.budget_per_hour - sum(calls for _, calls in self.state["api_calls"])
+
+    def expected_backlog(self, name: str, now: float) -> float:
+        sub = self.state["subreddits"][name]
+        if sub["last_polled_at"] is None or sub["rate_per_hour"] is None:
+            return float("inf")
+        return sub["rate_per_hour"] * (now - sub["last_polled_at"]) / 3600
+
+    def due(self, now: float) -> List[str]:
+        """
+        Subreddits whose next poll time has passed: those kept waiting longer than the minimum
+        interval first, longest wait first, then the rest by largest expected backlog
+        """
+        subs = self.state["subreddits"]
+
+        def priority(name):
+            waited = now - subs[name]["next_poll_at"]
+            if waited >= self.min_interval:
+                return (1, waited)
+            return (0, self.expected_backlog(name, now))
+
+        names = [n for n in self.subreddits if subs[n]["next_poll_at"] <= now]
+        return sorted(names, key=priority, reverse=True)
+
+    def poll_limit(self, name: str, now: float, calls_left: int) -> int:
+        """Listing items to request: the expected backlog with headroom, within the budget"""
+        backlog = self.expected_backlog(name, now)
+        wanted = MAX_POLL_ITEMS if math.isinf(backlog) else math.ceil(backlog * 1.5 / PAGE_SIZE) * PAGE_SIZE
+        if self.state["subreddits"][name]["newest_created_utc"] is None:
+            # First poll: one page is enough to measure the rate, the daily pull covers history
+            wanted = PAGE_SIZE
+        return max(1, min(MAX_POLL_ITEMS, max(PAGE_SIZE, wanted), calls_left * PAGE_SIZE))
+
+    def budget_scale(self) -> float:
+        """Factor stretching every interval so the projected calls per hour fit the budget"""
+        projected = sum(3600 / s["interval_seconds"] for s in self.state["subreddits"].values()
+                        if s["interval_seconds"])
+        return max(1.0, projected / self.budget_per_hour)
+
+    def record_poll(self, name: str, now: float, poll: Dict[str, Any]) -> Dict[str, Any]:
+        """Update a subreddit's rate, churn and next poll time from one poll"""
+        sub = self.state["subreddits"][name]
+        new_count, consumed = len(poll["new_ids"]), poll["consumed"]
+        overflowed = not poll["reached_seen"] and sub["newest_created_utc"] is not None
+
+        # Posts per hour since the last poll; without a complete window, over the span of what we got
+        if sub["last_polled_at"] is not None and poll["reached_seen"]:
+            window = now - sub["last_polled_at"]
+        elif poll["created"]:
+            window = now - min(poll["created"])
+        else:
+            window = now - (sub["last_polled_at"] or now)
+        observed_rate = new_count / max(window, 60) * 3600
+        churn = new_count / consumed if consumed else 0.0
+
+        if sub["rate_per_hour"] is None:
+            sub["rate_per_hour"], sub["churn"] = observed_rate, churn
+        else:
+            sub["rate_per_hour"] = RATE_ALPHA * observed_rate + (1 - RATE_ALPHA) * sub["rate_per_hour"]
+            sub["churn"] = RATE_ALPHA * churn + (1 - RATE_ALPHA) * sub["churn"]
+
+        if sub["rate_per_hour"] > 0:
+            interval = TARGET_NEW_PER_POLL / sub["rate_per_hour"] * 3600
+        else:
+            interval = self.max_interval
+        if overflowed:
+            sub["gaps"] += 1
+            interval = min(interval, sub["interval_seconds"] / 2)
+        sub["interval_seconds"] = min(self.max_interval, max(self.min_interval, interval))
+
+        if poll["created"]:
+            sub["newest_created_utc"] = max(poll["created"] + [sub["newest_created_utc"] or 0])
+        sub["seen_ids"] = (poll["new_ids"] + sub["seen_ids"])[:SEEN_IDS_KEPT]
+        sub["last_polled_at"] = now
+        sub["polls"] += 1
+
+        calls = max(1, math.ceil(consumed / PAGE_SIZE))
+        self.state["api_calls"].append([now, calls])
+        sub["next_poll_at"] = now + sub["interval_seconds"] * self.budget_scale()
+
+        return {
+            "new_posts": new_count,
+            "api_calls": calls,
+            "overflowed": overflowed,
+            "rate_per_hour": round(sub["rate_per_hour"], 2),
+            "churn": round(sub["churn"], 3),
+            "next_poll_in_minutes": round((sub["next_poll_at"] - now) / 60, 1),
+        }
+
+
+def poll_new_posts(reddit_instance, subreddit_name: str, sub_state: Dict[str, Any], limit: int, poll: Dict[str, Any]):
+    """Yield posts from the new listing until one we have already seen; results go into poll"""
+    seen_ids = set(sub_state["seen_ids"])
+    watermark = sub_state["newest_created_utc"]
+    poll.update({"consumed": 0, "new_ids": [], "created": [], "reached_seen": False})
+
+    logger.info(f"Polling r/{subreddit_name}/new for up to {limit} posts")
+    for submission in reddit_instance.subreddit(subreddit_name).new(limit=limit):
+        poll["consumed"] += 1
+        if submission.id in seen_ids or (watermark is not None and submission.created_utc < watermark):
+            poll["reached_seen"] = True
+            return
+        poll["new_ids"].append(submission.id)
+        poll["created"].append(submission.created_utc)
+        yield submission
+
+
+def run_poll_cycle(output_name: str, data_dir: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Poll every due subreddit once and save the new posts to <data_dir>/<output_name>.arrow"""
+    now = now or time.time()
+    config = extract_from_reddit.get_config()
+    if config.get("aws_config", "load_mode", fallback="upsert") != "append":
+        # Polled posts are appended to reddit_posts; dbt only reads them in append mode
+        raise ValueError("Polling needs load_mode = append in [aws_config], or polled posts never reach dbt")
+    subreddits = [s.strip() for s in config.get("polling_config", "subreddits", fallback="stocks").split(",") if s.strip()]
+    scheduler = PollingScheduler(
+        config.get("polling_config", "state_path", fallback=DEFAULT_STATE_PATH),
+        subreddits,
+        config.getint("polling_config", "api_budget_per_hour", fallback=DEFAULT_BUDGET_PER_HOUR),
+        config.getfloat("polling_config", "min_interval_minutes", fallback=DEFAULT_MIN_INTERVAL_MINUTES) * 60,
+        config.getfloat("polling_config", "max_interval_minutes", fallback=DEFAULT_MAX_INTERVAL_MINUTES) * 60,
+    )
+    scheduler.load()
+
+    due = scheduler.due(now)
+    if not due:
+        logger.info("No subreddit is due for a poll")
+        return None
+
+    reddit_instance = extract_from_reddit.api_connect(
+        config.get("reddit_config", "client_id"), config.get("reddit_config", "secret")
+    )
+    throttle_seconds = config.getfloat("reddit_config", "throttle_seconds", fallback=1)
+
+    frames, polls = [], {}
+    for name in due:
+        calls_left = scheduler.calls_remaining(now)
+        if calls_left <= 0:
+            logger.warning(f"API budget of {scheduler.budget_per_hour}/hour used up; deferring {len(due) - len(polls)} subreddits")
+            break
+        poll = {}
+        limit = scheduler.poll_limit(name, now, calls_left)
+        posts = poll_new_posts(reddit_instance, name, scheduler.state["subreddits"][name], limit, poll)
+        frames.append(extract_from_reddit.extract_data(posts, extract_from_reddit.POST_FIELDS, throttle_seconds=throttle_seconds))
+        polls[name] = scheduler.record_poll(name, now, poll)
+        logger.info(f"r/{name}: {polls[name]}")
+
+    new_posts = [df for df in frames if not df.empty]
+    output_path = None
+    if new_posts:
+        output_path = f"{data_dir}/{output_name}.arrow"
+        symbols_path = config.get("reddit_config", "symbols_path", fallback=extract_from_reddit.DEFAULT_SYMBOLS_PATH)
+        extract_from_reddit.process_extract(pd.concat(new_posts, ignore_index=True), output_path, symbols_path=symbols_path)
+
+    # Saved only once the output is written, so a failed run polls the same posts again
+    scheduler.save()
+
+    summary = {
+        "subreddits_due": len(due),
+        "subreddits_polled": len(polls),
+        "new_posts": sum(p["new_posts"] for p in polls.values()),
+        "api_calls": sum(p["api_calls"] for p in polls.values()),
+        "api_calls_remaining": scheduler.calls_remaining(now),
+        "output_path": output_path,
+        "polls": polls,
+    }
+    write_run_report(output_name, "polling", summary)
+    logger.info(f"Polled {len(polls)} subreddits: {summary['new_posts']} new posts in {summary['api_calls']} API calls")
+    return summary
+
+
+class SimulatedSubmission:
+    def __init__(self, post_id: str, created_utc: float):
+        self.id = post_id
+        self.created_utc = created_utc
+
+
+class SimulatedSubreddit:
+    """new listing of a subreddit's posts created up to the simulated clock, newest first"""
+
+    def __init__(self, posts: List[SimulatedSubmission], clock: Dict[str, float]):
+        self.posts = posts
+        self.clock = clock
+
+    def new(self, limit=None, params=None):
+        visible = [p for p in reversed(self.posts) if p.created_utc <= self.clock["now"]]
+        return iter(visible[:limit])
+
+
+class SimulatedReddit:
+    def __init__(self, posts: Dict[str, List[SimulatedSubmission]], clock: Dict[str, float]):
+        self.posts = posts
+        self.clock = clock
+
+    def subreddit(self, name: str) -> SimulatedSubreddit:
+        return SimulatedSubreddit(self.posts[name], self.clock)
+
+
+def simulate(
+    rates_per_hour: Dict[str, float] = None,
+    hours: float = 48,
+    tick_minutes: float = 5,
+    budget_per_hour: int = DEFAULT_BUDGET_PER_HOUR,
+    min_interval: float = DEFAULT_MIN_INTERVAL_MINUTES * 60,
+    max_interval: float = DEFAULT_MAX_INTERVAL_MINUTES * 60,
+    seed: int = 7
+) -> Dict[str, Any]:
+    """Run the scheduler every tick against simulated subreddits and measure coverage and API use"""
+    rates_per_hour = rates_per_hour or DEFAULT_SIMULATED_RATES
+    rng = random.Random(seed)
+    start, end = 0.0, hours * 3600
+    posts = {}
+    for name, rate in rates_per_hour.items():
+        # Subreddits have history; the first poll measures the rate from it
+        created, posts[name] = start - SIMULATED_HISTORY_HOURS * 3600, []
+        while rate > 0:
+            created += rng.expovariate(rate / 3600)
+            if created > end:
+                break
+            posts[name].append(SimulatedSubmission(f"{name}_{len(posts[name])}", created))
+
+    clock = {"now": start}
+    reddit_instance = SimulatedReddit(posts, clock)
+    fetched = {name: set() for name in rates_per_hour}
+    api_calls = 0
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        scheduler = PollingScheduler(f"{state_dir}/state.json", list(rates_per_hour),
+                                     budget_per_hour, min_interval, max_interval)
+        scheduler.load()
+        log_level = logger.level
+        logger.setLevel(logging.WARNING)
+        try:
+            while clock["now"] <= end:
+                now = clock["now"]
+                for name in scheduler.due(now):
+                    calls_left = scheduler.calls_remaining(now)
+                    if calls_left <= 0:
+                        break
+                    poll = {}
+                    limit = scheduler.poll_limit(name, now, calls_left)
+                    sub_state = scheduler.state["subreddits"][name]
+                    fetched[name].update(p.id for p in poll_new_posts(reddit_instance, name, sub_state, limit, poll))
+                    api_calls += scheduler.record_poll(name, now, poll)["api_calls"]
+                clock["now"] += tick_minutes * 60
+        finally:
+            logger.setLevel(log_level)
+
+    subreddits = {}
+    for name, sub in scheduler.state["subreddits"].items():
+        # History is left to the daily pull
+        last_poll = sub["last_polled_at"] or start
+        reachable = {p.id for p in posts[name] if p.created_utc > start}
+        subreddits[name] = {
+            "rate_per_hour": rates_per_hour[name],
+            "posts": len(posts[name]),
+            "reachable": len(reachable),
+            "fetched": len(fetched[name] & reachable),
+            "missed": len(reachable - fetched[name]),
+            "pending": sum(1 for p in posts[name] if p.created_utc > last_poll),
+            "polls": sub["polls"],
+            "gaps": sub["gaps"],
+            "interval_minutes": round(sub["interval_seconds"] / 60, 1),
+        }
+        logger.info(f"r/{name}: {subreddits[name]}")
+
+    summary = {
+        "hours": hours,
+        "api_calls": api_calls,
+        "api_calls_per_hour": round(api_calls / hours, 2),
+        "budget_per_hour": budget_per_hour,
+        "gaps": sum(s["gaps"] for s in subreddits.values()),
+        "missed": sum(s["missed"] for s in subreddits.values()),
+        "subreddits": subreddits,
+    }
+    logger.info(
+        f"Simulated {hours}h: {summary['api_calls_per_hour']} API calls/hour, "
+        f"{summary['gaps']} gaps, {summary['missed']} reachable posts missed"
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Poll due subreddits, or simulate the scheduler")
+    arg_parser.add_argument("--simulate", action="store_true", help="replay the scheduler against simulated subreddits")
+    arg_parser.add_argument("--hours", type=float, default=48, help="simulated duration")
+    arg_parser.add_argument("--rates", default=None,
+                            help="simulated posts/hour per subreddit, e.g. hot=300,warm=10,cold=0.5")
+    arg_parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET_PER_HOUR, help="API calls per hour")
+    args = arg_parser.parse_args()
+
+    if args.simulate:
+        rates = None
+        if args.rates:
+            rates = {name: float(rate) for name, rate in (pair.split("=") for pair in args.rates.split(","))}
+        simulate(rates, args.hours, budget_per_hour=args.budget)
+        sys.exit(0)
+
+    output_name = datetime.now().strftime('%Y%m%d_%H%M')
+    data_dir = os.environ.get("REDDIT_ETL_DATA_DIR", "/Users/dharmatejasamudrala/reddit-etl/tmp")
+    try:
+        summary = run_poll_cycle(output_name, data_dir)
+    except Exception as e:
+        logger.error(f"Polling failed: {e}")
+        sys.exit(1)
+
+    if not summary or not summary["new_posts"]:
+        sys.exit(NOTHING_NEW_EXIT_CODE)
+    # Last line of output is pushed to XCom for the upload and load tasks
+    print(output_name)
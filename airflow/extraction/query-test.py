@@ -41,15 +41,25 @@ def query_redshift_data():
     print(top_posts_df)
     
     # Example 2: Analysis by subreddit
+    # Aggregate on the integer key, then look up the few subreddit names
     query2 = """
     SELECT 
-        COUNT(*) as post_count,
-        AVG(score) as avg_score,
-        AVG(num_comments) as avg_comments
-    FROM reddit
-    GROUP BY subreddit
-    HAVING COUNT(*) > 5
-    ORDER BY avg_score DESC
+        s.subreddit,
+        r.post_count,
+        r.avg_score,
+        r.avg_comments
+    FROM (
+        SELECT 
+            subreddit_key,
+            COUNT(*) as post_count,
+            AVG(score) as avg_score,
+            AVG(num_comments) as avg_comments
+        FROM reddit
+        GROUP BY subreddit_key
+        HAVING COUNT(*) > 5
+    ) r
+    LEFT JOIN reddit_subreddits s ON s.subreddit_key = r.subreddit_key
+    ORDER BY r.avg_score DESC
     """
     
     subreddit_stats_df = pd.read_sql(query2, conn)
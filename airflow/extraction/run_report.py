@@ -0,0 +1,40 @@
+import json
+import logging
+import os
+import pathlib
+from datetime import datetime
+from typing import Dict, Any
+
+"""
+Per-run report shared by the pipeline stages. Each stage adds its own section to
+tmp/reports/<YYYYMMDD>.json, so one file describes everything that happened to a day's data.
+"""
+
+logger = logging.getLogger('run_report')
+
+REPORT_DIR = pathlib.Path(os.environ.get(
+    "REDDIT_ETL_REPORT_DIR", pathlib.Path(__file__).resolve().parents[2] / "tmp" / "reports"
+))
+
+
+def write_run_report(run_name: str, section: str, data: Dict[str, Any], report_dir: str = None) -> str:
+    """Add or replace one section of the run report and return the report path"""
+    directory = pathlib.Path(report_dir) if report_dir else REPORT_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    report_path = directory / f"{run_name}.json"
+
+    report = {}
+    if report_path.exists():
+        with open(report_path) as f:
+            report = json.load(f)
+
+    report[section] = data
+    report[section]["reported_at"] = datetime.now().isoformat()
+
+    tmp_path = report_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    tmp_path.replace(report_path)
+
+    logger.info(f"Wrote {section} section to {report_path}")
+    return str(report_path)
@@ -0,0 +1,193 @@
+import argparse
+import bz2
+import glob
+import gzip
+import io
+import logging
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any, Optional
+
+import pandas as pd
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+"""
+Compression of the validated CSV before it goes to S3. upload_to_s3.py compresses the file
+with the configured codec and uploads it as <YYYYMMDD>.csv<suffix>; s3_to_redshift.py reads
+the same setting to build the S3 key and the matching COPY option, so the two must share a
+configuration file. Set it with `compression = gzip|zstd|bzip2|none` under [aws_config].
+
+Run `python s3_compression.py --benchmark` to compare the codecs on the extracts in tmp/:
+compression ratio, compress time, and decompress + CSV parse time as a stand-in for the
+read side of COPY. The codec with the lowest estimated end-to-end time at the given upload
+bandwidth is recommended.
+"""
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('s3_compression')
+
+script_path = pathlib.Path(__file__).parent.resolve()
+
+# codec -> (file suffix, Redshift COPY option)
+CODECS = {
+    "gzip": (".gz", "GZIP"),
+    "zstd": (".zst", "ZSTD"),
+    "bzip2": (".bz2", "BZIP2"),
+    "none": ("", ""),
+}
+# gzip needs no extra package and shrinks the sample extracts about 2.6x; when zstandard
+# is installed the benchmark recommends zstd (similar ratio for a fraction of the CPU time)
+DEFAULT_CODEC = "gzip"
+
+# Levels favour speed: the file is compressed once per run, on the Airflow worker
+COMPRESSION_LEVELS = {"gzip": 6, "zstd": 3, "bzip2": 9}
+COPY_BUFFER_BYTES = 1024 * 1024
+
+
+def check_codec(codec: str) -> str:
+    """Normalise a configured codec name, failing early if it cannot be used"""
+    codec = (codec or "none").strip().lower()
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression codec '{codec}', expected one of {', '.join(CODECS)}")
+    if codec == "zstd" and zstandard is None:
+        raise ImportError("zstandard is required for zstd compression (pip install zstandard)")
+    return codec
+
+
+def s3_key(output_name: str, codec: str) -> str:
+    """S3 key of a run's CSV, e.g. 20250320.csv.gz"""
+    return f"{output_name}.csv{CODECS[codec][0]}"
+
+
+def copy_option(codec: str) -> str:
+    """COPY option that tells Redshift how the object is compressed"""
+    return CODECS[codec][1]
+
+
+def open_compressed(path: str, mode: str, codec: str, level: Optional[int] = None):
+    """Binary file object that (de)compresses with codec while streaming"""
+    level = level or COMPRESSION_LEVELS.get(codec)
+    if codec == "gzip":
+        return gzip.open(path, mode, compresslevel=level) if "w" in mode else gzip.open(path, mode)
+    if codec == "bzip2":
+        return bz2.open(path, mode, compresslevel=level) if "w" in mode else bz2.open(path, mode)
+    if codec == "zstd":
+        raw = open(path, mode)
+        if "w" in mode:
+            return zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return open(path, mode)
+
+
+def compress_file(path: str, codec: str, output_path: Optional[str] = None, level: Optional[int] = None) -> Dict[str, Any]:
+    """Compress path with codec and return the output path, sizes and timing"""
+    codec = check_codec(codec)
+    output_path = output_path or f"{path}{CODECS[codec][0]}"
+    start = time.perf_counter()
+    if codec == "none":
+        if output_path != path:
+            shutil.copyfile(path, output_path)
+    else:
+        with open(path, "rb") as source, open_compressed(output_path, "wb", codec, level) as sink:
+            shutil.copyfileobj(source, sink, COPY_BUFFER_BYTES)
+    seconds = time.perf_counter() - start
+
+    raw_bytes = os.path.getsize(path)
+    compressed_bytes = os.path.getsize(output_path)
+    return {
+        "codec": codec,
+        "input_path": path,
+        "output_path": output_path,
+        "raw_bytes": raw_bytes,
+        "compressed_bytes": compressed_bytes,
+        "ratio": round(raw_bytes / compressed_bytes, 2) if compressed_bytes else None,
+        "seconds": round(seconds, 3),
+    }
+
+
+def run_benchmark(
+    sample_paths: List[str],
+    codecs: Optional[List[str]] = None,
+    upload_mb_per_second: float = 20.0
+) -> Dict[str, Any]:
+    """Compress, decompress and parse every sample with each codec and recommend one"""
+    if not sample_paths:
+        raise ValueError("No sample files to benchmark")
+    codecs = codecs or [c for c in CODECS if c != "zstd" or zstandard is not None]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for codec in codecs:
+            codec = check_codec(codec)
+            raw_bytes = compressed_bytes = 0
+            compress_seconds = load_seconds = 0.0
+            for path in sample_paths:
+                output_path = str(pathlib.Path(work_dir) / f"{pathlib.Path(path).name}{CODECS[codec][0] or '.copy'}")
+                stats = compress_file(path, codec, output_path)
+                raw_bytes += stats["raw_bytes"]
+                compressed_bytes += stats["compressed_bytes"]
+                compress_seconds += stats["seconds"]
+
+                start = time.perf_counter()
+                with open_compressed(output_path, "rb", codec) as source:
+                    pd.read_csv(io.BufferedReader(source) if codec == "zstd" else source)
+                load_seconds += time.perf_counter() - start
+                os.remove(output_path)
+
+            upload_seconds = compressed_bytes / (upload_mb_per_second * 1e6)
+            results[codec] = {
+                "raw_mb": round(raw_bytes / 1e6, 3),
+                "compressed_mb": round(compressed_bytes / 1e6, 3),
+                "ratio": round(raw_bytes / compressed_bytes, 2) if compressed_bytes else None,
+                "compress_seconds": round(compress_seconds, 3),
+                "load_seconds": round(load_seconds, 3),
+                "upload_seconds": round(upload_seconds, 3),
+                "total_seconds": round(compress_seconds + upload_seconds + load_seconds, 3),
+            }
+
+    for codec, stats in results.items():
+        logger.info(
+            f"{codec:>6}: ratio {stats['ratio']}x, {stats['compressed_mb']} MB, compress {stats['compress_seconds']}s, "
+            f"load {stats['load_seconds']}s, est. total {stats['total_seconds']}s"
+        )
+    recommended = min(results, key=lambda c: results[c]["total_seconds"])
+    logger.info(f"Recommended codec at {upload_mb_per_second} MB/s upload: {recommended}")
+    return {"samples": sample_paths, "upload_mb_per_second": upload_mb_per_second,
+            "codecs": results, "recommended": recommended}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compress a CSV for S3, or benchmark the codecs")
+    arg_parser.add_argument("input_path", nargs="?", help="CSV file to compress")
+    arg_parser.add_argument("--codec", default=DEFAULT_CODEC, choices=list(CODECS))
+    arg_parser.add_argument("--benchmark", action="store_true", help="compare codecs on sample files")
+    arg_parser.add_argument("--samples", nargs="+", default=None, help="sample files, defaults to tmp/*.csv")
+    arg_parser.add_argument("--upload-mb-per-second", type=float, default=20.0,
+                            help="upload bandwidth used to weigh size against CPU time")
+    args = arg_parser.parse_args()
+
+    try:
+        if args.benchmark:
+            samples = args.samples or sorted(glob.glob(str(script_path.parents[1] / "tmp" / "*.csv")))
+            run_benchmark(samples, upload_mb_per_second=args.upload_mb_per_second)
+        elif args.input_path:
+            stats = compress_file(args.input_path, args.codec)
+            logger.info(f"Wrote {stats['output_path']} ({stats['ratio']}x smaller in {stats['seconds']}s)")
+        else:
+            arg_parser.print_usage()
+            sys.exit(1)
+    except Exception as e:
+        logger.error(f"Compression failed: {e}")
+        sys.exit(1)
@@ -1,10 +1,15 @@
 import configparser
 import logging
+import os
 import pathlib
 import psycopg2
 import sys
 from psycopg2 import sql
 from datetime import datetime
+from dimension_keys import AUTHORS, SUBREDDITS, assign_staged_keys, create_dimensions, lock_dimensions
+from run_report import write_run_report
+from s3_compression import CODECS, DEFAULT_CODEC, copy_option, s3_key
+from table_maintenance import run_maintenance
 
 """
 Part of DAG. Upload S3 CSV data to Redshift. Takes one argument of format YYYYMMDD. This is the name of 
@@ -12,6 +17,25 @@ the file to copy from S3. Script will load data into temporary table in Redshift
 records with the same post ID from main table, then insert these from temp table (along with new data) 
 to main table. This means that if we somehow pick up duplicate records in a new DAG run,
 the record in Redshift will be updated to reflect any changes in that record, if any (e.g. higher score or more comments).
+Files are validated by validate_csv.py before upload, so any COPY error here is unexpected and fails the load.
+
+An optional second argument selects the load mode. "upsert" (default) is the delete-then-insert above.
+"append" never deletes: immutable post attributes are inserted once into reddit_posts and every load
+appends a (id, observed_at, score, num_comments, upvote_ratio) row to reddit_post_metrics, keeping
+the score and comment history. reddit_post_latest shows the most recent observation of each post.
+
+After the load commits, the loaded tables are vacuumed/analyzed if their health has degraded past
+the thresholds in table_maintenance.py, and the before/after numbers go to the run report.
+
+Authors and subreddits are stored once in the reddit_authors and reddit_subreddits dimensions;
+the fact tables hold their integer author_key and subreddit_key (see dimension_keys.py). Keys
+for names first seen in a load are assigned after the COPY, then joined in on insert.
+
+Both modes also load the run's post -> ticker table (<YYYYMMDD>_tickers.csv.gz, uploaded
+by upload_to_s3.py) into reddit_post_tickers, replacing the tickers of every post loaded.
+
+The S3 key and COPY compression option follow `compression` in [aws_config], which must match
+the setting upload_to_s3.py ran with.
 """
 
 # Configure logging
@@ -28,7 +52,7 @@ logger = logging.getLogger('redshift_loader')
 # Parse our configuration file
 script_path = pathlib.Path(__file__).parent.resolve()
 parser = configparser.ConfigParser()
-config_path = f"{script_path}/configuration.conf"
+config_path = os.environ.get("REDDIT_ETL_CONFIG", f"{script_path}/configuration.conf")
 logger.info(f"Reading configuration from {config_path}")
 parser.read(config_path)
 
@@ -42,98 +66,18 @@ DATABASE = parser.get("aws_config", "redshift_database")
 BUCKET_NAME = parser.get("aws_config", "bucket_name")
 ACCOUNT_ID = parser.get("aws_config", "account_id")
 TABLE_NAME = "reddit"
+POSTS_TABLE = "reddit_posts"
+METRICS_TABLE = "reddit_post_metrics"
+LATEST_VIEW = "reddit_post_latest"
+TICKERS_TABLE = "reddit_post_tickers"
+LOAD_MODE = parser.get("aws_config", "load_mode", fallback="upsert")
+# Only names the COPY option; zstandard is not needed to load zstd files
+COMPRESSION = parser.get("aws_config", "compression", fallback=DEFAULT_CODEC).strip().lower()
 
 logger.info(f"Using Redshift host: {HOST}")
 logger.info(f"Using S3 bucket: {BUCKET_NAME}")
 
 
-def check_iam_role_permissions(rs_conn):
-    """Verify the IAM role has proper permissions using a different method"""
-    try:
-        cur = rs_conn.cursor()
-        logger.info(f"Checking IAM role permissions: {role_string}")
-        
-        # Test if role can access S3 directly
-        try:
-            bucket = file_path.replace('s3://', '').split('/')[0]
-            key_prefix = '/'.join(file_path.replace('s3://', '').split('/')[1:-1])
-            if not key_prefix.endswith('/'):
-                key_prefix += '/'
-                
-            # Simplified test - just try to list objects
-            test_query = f"""
-            SELECT 'testing_s3_access';
-            """
-            cur.execute(test_query)
-            logger.info("Basic query execution successful")
-            
-            # Now try a simple COPY to test S3 access
-            cur.execute("DROP TABLE IF EXISTS test_s3_access; CREATE TEMP TABLE test_s3_access (col1 VARCHAR(100));")
-            
-            test_copy = f"""
-            COPY test_s3_access FROM '{file_path}'
-            iam_role '{role_string}'
-            CSV IGNOREHEADER 1
-            MAXERROR 1;
-            """
-            
-            try:
-                cur.execute(test_copy)
-                logger.info("IAM role can access the S3 file")
-                return True
-            except Exception as e:
-                logger.error(f"IAM role cannot access S3 file: {e}")
-                # Check if this is a permissions issue or some other error
-                if "Access Denied" in str(e) or "403" in str(e):
-                    logger.error("This appears to be an S3 permissions issue")
-                elif "does not exist" in str(e) or "404" in str(e):
-                    logger.error("The S3 file appears not to exist")
-                else:
-                    logger.error("This appears to be a different kind of error")
-                check_load_errors(rs_conn)
-                return False
-            finally:
-                cur.execute("DROP TABLE IF EXISTS test_s3_access;")
-                
-        except Exception as e:
-            logger.error(f"Error testing S3 access: {e}")
-            return False
-    except Exception as e:
-        logger.error(f"Error checking IAM role: {e}")
-        return False
-   
-    try:
-        cur = rs_conn.cursor()
-        logger.info(f"Checking IAM role permissions: {role_string}")
-        # Test if role can be used by Redshift
-        cur.execute(f"""
-        SELECT count(*) 
-        FROM svv_redshift_roles
-        WHERE iam_role_arn = '{role_string}';
-        """)
-        role_count = cur.fetchone()[0]
-        if role_count == 0:
-            logger.error(f"IAM role {role_string} is not associated with Redshift")
-        else:
-            logger.info(f"IAM role {role_string} is properly associated with Redshift")
-            
-        # Test if role can access S3
-        try:
-            bucket = file_path.replace('s3://', '').split('/')[0]
-            cur.execute(f"""
-            SELECT aws_s3.list_objects(
-                aws_commons.create_s3_uri('{bucket}', '', ''),
-                '{role_string}'
-            );
-            """)
-            logger.info("IAM role can access the S3 bucket")
-            return True
-        except Exception as e:
-            logger.error(f"IAM role cannot access S3 bucket: {e}")
-            return False
-    except Exception as e:
-        logger.error(f"Error checking IAM role: {e}")
-        return False
 # Check command line argument passed
 try:
     output_name = sys.argv[1]
@@ -143,8 +87,20 @@ except Exception as e:
     logger.info(f"Command line argument not provided, using current date: {current_date}")
     output_name = current_date
 
+if len(sys.argv) > 2:
+    LOAD_MODE = sys.argv[2]
+if LOAD_MODE not in ("upsert", "append"):
+    logger.error(f"Unknown load mode '{LOAD_MODE}', expected 'upsert' or 'append'")
+    sys.exit(1)
+logger.info(f"Using load mode: {LOAD_MODE}")
+
+if COMPRESSION not in CODECS:
+    logger.error(f"Unknown compression '{COMPRESSION}', expected one of {', '.join(CODECS)}")
+    sys.exit(1)
+
 # Our S3 file & role_string
-file_path = f"s3://{BUCKET_NAME}/{output_name}.csv"
+file_path = f"s3://{BUCKET_NAME}/{s3_key(output_name, COMPRESSION)}"
+tickers_file_path = f"s3://{BUCKET_NAME}/{s3_key(f'{output_name}_tickers', COMPRESSION)}"
 role_string = f"arn:aws:iam::{ACCOUNT_ID}:role/{REDSHIFT_ROLE}"
 
 logger.info(f"Will load data from: {file_path}")
@@ -165,7 +121,7 @@ sql_create_table = sql.SQL(
         title varchar(4000),
         score int,
         num_comments int,
-        author varchar(100),
+        author_key int,
         created_utc timestamp,
         url varchar(2000),
         upvote_ratio float,
@@ -173,14 +129,16 @@ sql_create_table = sql.SQL(
         spoiler varchar(10),
         stickied varchar(10),
         selftext varchar(65535),
-        subreddit varchar(100),
+        subreddit_key int,
         extraction_timestamp timestamp,
         selftext_length int,
-        is_nsfw varchar(10)
+        is_nsfw varchar(10),
+        cluster_id varchar(100)
     );"""
 ).format(table=sql.Identifier(TABLE_NAME))
 
 # If ID already exists in table, we remove it and add new ID record during load.
+# Column list is mirrored by STAGING_COLUMNS in validate_csv.py - keep both in sync.
 create_temp_table = """
 CREATE TEMP TABLE our_staging_table (
     id varchar(100) PRIMARY KEY,
@@ -198,7 +156,8 @@ CREATE TEMP TABLE our_staging_table (
     subreddit varchar(100),
     extraction_timestamp timestamp,
     selftext_length int,
-    is_nsfw varchar(10)
+    is_nsfw varchar(10),
+    cluster_id varchar(100)
 );
 """
 
@@ -206,16 +165,17 @@ sql_copy_to_temp = f"""
 COPY our_staging_table(id, title, score, num_comments, author, created_utc, url, 
                      upvote_ratio, over_18, spoiler, stickied, 
                      selftext, subreddit, extraction_timestamp,
-                     selftext_length, is_nsfw)
+                     selftext_length, is_nsfw, cluster_id)
 FROM '{file_path}' 
 iam_role '{role_string}' 
 IGNOREHEADER 1 
 DELIMITER ',' 
 CSV 
+{copy_option(COMPRESSION)}
 ACCEPTINVCHARS AS ' '
 EMPTYASNULL
 TRUNCATECOLUMNS
-MAXERROR 100
+MAXERROR 0
 ACCEPTANYDATE
 DATEFORMAT 'auto'
 TIMEFORMAT 'auto'
@@ -227,73 +187,208 @@ delete_from_table = sql.SQL(
     "DELETE FROM {table} USING our_staging_table WHERE {table}.id = our_staging_table.id;"
 ).format(table=sql.Identifier(TABLE_NAME))
 
+# Names are swapped for their dimension keys; deleted authors stay NULL
 insert_into_table = sql.SQL(
-    "INSERT INTO {table} SELECT * FROM our_staging_table;"
-).format(table=sql.Identifier(TABLE_NAME))
+    """INSERT INTO {table} (id, title, score, num_comments, author_key, created_utc, url, upvote_ratio,
+                         over_18, spoiler, stickied, selftext, subreddit_key, extraction_timestamp,
+                         selftext_length, is_nsfw, cluster_id)
+    SELECT s.id, s.title, s.score, s.num_comments, a.author_key, s.created_utc, s.url, s.upvote_ratio,
+           s.over_18, s.spoiler, s.stickied, s.selftext, r.subreddit_key, s.extraction_timestamp,
+           s.selftext_length, s.is_nsfw, s.cluster_id
+    FROM our_staging_table s
+    LEFT JOIN {authors} a ON a.author = s.author
+    LEFT JOIN {subreddits} r ON r.subreddit = s.subreddit;"""
+).format(
+    table=sql.Identifier(TABLE_NAME),
+    authors=sql.Identifier(AUTHORS.table),
+    subreddits=sql.Identifier(SUBREDDITS.table),
+)
 
 drop_temp_table = "DROP TABLE our_staging_table;"
 
-def inspect_csv_structure(rs_conn):
-    """Inspect the first few lines of the CSV to determine its structure"""
-    try:
-        cur = rs_conn.cursor()
-        
-        # Create a table to hold raw CSV lines
-        cur.execute("DROP TABLE IF EXISTS csv_raw; CREATE TEMP TABLE csv_raw (line VARCHAR(65535));")
-        
-        # Load the first few lines without any parsing
-        inspect_copy = f"""
-        COPY csv_raw FROM '{file_path}'
-        iam_role '{role_string}'
-        DELIMITER '\n'
-        MAXERROR 10
-        LIMIT 5;
-        """
-        cur.execute(inspect_copy)
-        
-        # Look at what we got
-        cur.execute("SELECT * FROM csv_raw ORDER BY line LIMIT 2;")
-        lines = cur.fetchall()
-        
-        if lines:
-            header = lines[0][0]
-            logger.info(f"CSV header: {header}")
-            columns = header.split(',')
-            column_count = len(columns)
-            logger.info(f"CSV has {column_count} columns: {columns}")
-            
-            # If there's a second line, examine a data row
-            if len(lines) > 1:
-                data_row = lines[1][0]
-                logger.info(f"Sample data row: {data_row}")
-                
-            return columns
-        else:
-            logger.error("Could not load any lines from the CSV file")
-            return []
-            
-    except Exception as e:
-        logger.error(f"Error inspecting CSV structure: {e}")
-        return []
-    finally:
-        try:
-            cur.execute("DROP TABLE IF EXISTS csv_raw;")
-        except:
-            pass
+# Post -> ticker mentions found by ticker_tagger.py, one row per (post, ticker)
+sql_create_tickers_table = sql.SQL(
+    """CREATE TABLE IF NOT EXISTS {table} (
+        id varchar(100) NOT NULL,
+        ticker varchar(20) NOT NULL,
+        mentions int,
+        in_title varchar(10)
+    )
+    DISTKEY(id)
+    SORTKEY(ticker, id);"""
+).format(table=sql.Identifier(TICKERS_TABLE))
+
+create_tickers_temp_table = """
+CREATE TEMP TABLE our_staging_tickers (
+    id varchar(100),
+    ticker varchar(20),
+    mentions int,
+    in_title varchar(10)
+);
+"""
+
+sql_copy_tickers_to_temp = f"""
+COPY our_staging_tickers(id, ticker, mentions, in_title)
+FROM '{tickers_file_path}' 
+iam_role '{role_string}' 
+IGNOREHEADER 1 
+DELIMITER ',' 
+CSV 
+{copy_option(COMPRESSION)}
+EMPTYASNULL
+MAXERROR 0;
+"""
+
+# Tickers are re-tagged from the text on every extract, so a post's rows are replaced
+# rather than added to; posts the validator quarantined are left out
+delete_staged_tickers = sql.SQL(
+    "DELETE FROM {table} USING our_staging_table WHERE {table}.id = our_staging_table.id;"
+).format(table=sql.Identifier(TICKERS_TABLE))
+
+insert_tickers = sql.SQL(
+    """INSERT INTO {table} (id, ticker, mentions, in_title)
+    SELECT t.id, t.ticker, t.mentions, t.in_title
+    FROM our_staging_tickers t
+    WHERE t.id IN (SELECT id FROM our_staging_table);"""
+).format(table=sql.Identifier(TICKERS_TABLE))
+
+drop_tickers_temp_table = "DROP TABLE our_staging_tickers;"
+
+# Append-only layout: attributes that never change are stored once per post,
+# metrics that change between loads are appended as a time series.
+sql_create_posts_table = sql.SQL(
+    """CREATE TABLE IF NOT EXISTS {table} (
+        id varchar(100) PRIMARY KEY,
+        title varchar(4000),
+        author_key int,
+        created_utc timestamp,
+        url varchar(2000),
+        over_18 varchar(10),
+        spoiler varchar(10),
+        stickied varchar(10),
+        selftext varchar(65535),
+        subreddit_key int,
+        selftext_length int,
+        is_nsfw varchar(10),
+        cluster_id varchar(100),
+        first_seen_at timestamp
+    )
+    DISTKEY(id)
+    SORTKEY(id);"""
+).format(table=sql.Identifier(POSTS_TABLE))
+
+sql_create_metrics_table = sql.SQL(
+    """CREATE TABLE IF NOT EXISTS {table} (
+        id varchar(100) NOT NULL,
+        observed_at timestamp NOT NULL,
+        score int,
+        num_comments int,
+        upvote_ratio float
+    )
+    DISTKEY(id)
+    SORTKEY(id, observed_at);"""
+).format(table=sql.Identifier(METRICS_TABLE))
+
+# Recreated rather than replaced: CREATE OR REPLACE VIEW cannot move existing columns
+sql_create_latest_view = sql.SQL(
+    """DROP VIEW IF EXISTS {view};
+    CREATE VIEW {view} AS
+    SELECT p.id, p.title, p.author_key, a.author, p.created_utc, p.url, p.over_18, p.spoiler, p.stickied,
+           p.selftext, p.subreddit_key, r.subreddit, p.selftext_length, p.is_nsfw, p.cluster_id, p.first_seen_at,
+           m.observed_at, m.score, m.num_comments, m.upvote_ratio
+    FROM {posts} p
+    LEFT JOIN {authors} a ON a.author_key = p.author_key
+    LEFT JOIN {subreddits} r ON r.subreddit_key = p.subreddit_key
+    JOIN (
+        SELECT id, observed_at, score, num_comments, upvote_ratio,
+               ROW_NUMBER() OVER (PARTITION BY id ORDER BY observed_at DESC) AS observation_rank
+        FROM {metrics}
+    ) m ON m.id = p.id AND m.observation_rank = 1;"""
+).format(
+    view=sql.Identifier(LATEST_VIEW),
+    posts=sql.Identifier(POSTS_TABLE),
+    metrics=sql.Identifier(METRICS_TABLE),
+    authors=sql.Identifier(AUTHORS.table),
+    subreddits=sql.Identifier(SUBREDDITS.table),
+)
+
+# Only posts we have never seen before
+insert_new_posts = sql.SQL(
+    """INSERT INTO {table} (id, title, author_key, created_utc, url, over_18, spoiler, stickied,
+                         selftext, subreddit_key, selftext_length, is_nsfw, cluster_id, first_seen_at)
+    SELECT s.id, s.title, a.author_key, s.created_utc, s.url, s.over_18, s.spoiler, s.stickied,
+           s.selftext, r.subreddit_key, s.selftext_length, s.is_nsfw, s.cluster_id, s.extraction_timestamp
+    FROM our_staging_table s
+    LEFT JOIN {authors} a ON a.author = s.author
+    LEFT JOIN {subreddits} r ON r.subreddit = s.subreddit
+    WHERE NOT EXISTS (SELECT 1 FROM {table} p WHERE p.id = s.id);"""
+).format(
+    table=sql.Identifier(POSTS_TABLE),
+    authors=sql.Identifier(AUTHORS.table),
+    subreddits=sql.Identifier(SUBREDDITS.table),
+)
+
+# Skip observations already loaded so re-running the same file is a no-op
+append_metrics = sql.SQL(
+    """INSERT INTO {table} (id, observed_at, score, num_comments, upvote_ratio)
+    SELECT s.id, s.extraction_timestamp, s.score, s.num_comments, s.upvote_ratio
+    FROM our_staging_table s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM {table} m
+        WHERE m.id = s.id AND m.observed_at = s.extraction_timestamp
+    );"""
+).format(table=sql.Identifier(METRICS_TABLE))
+
+# reddit_posts tables created before near-duplicate clustering have no cluster_id;
+# posts loaded back then are each their own cluster, as validate_csv.py fills old files
+sql_add_cluster_id = sql.SQL(
+    """ALTER TABLE {table} ADD COLUMN cluster_id varchar(100);
+    UPDATE {table} SET cluster_id = id;"""
+).format(table=sql.Identifier(POSTS_TABLE))
+
+# reddit_posts tables created before the dimension tables hold the names themselves
+sql_migrate_posts_table = sql.SQL(
+    """DROP VIEW IF EXISTS {view};
+    ALTER TABLE {table} ADD COLUMN author_key int;
+    ALTER TABLE {table} ADD COLUMN subreddit_key int;
+    UPDATE {table} SET author_key = a.author_key FROM {authors} a WHERE a.author = {table}.author;
+    UPDATE {table} SET subreddit_key = r.subreddit_key FROM {subreddits} r WHERE r.subreddit = {table}.subreddit;
+    ALTER TABLE {table} DROP COLUMN author;
+    ALTER TABLE {table} DROP COLUMN subreddit;"""
+).format(
+    view=sql.Identifier(LATEST_VIEW),
+    table=sql.Identifier(POSTS_TABLE),
+    authors=sql.Identifier(AUTHORS.table),
+    subreddits=sql.Identifier(SUBREDDITS.table),
+)
+
 def main():
     """Upload file form S3 to Redshift Table"""
     try:
         logger.info("Starting Redshift data load process")
         rs_conn = connect_to_redshift()
-        # inspect_csv_structure(rs_conn)
-        # check_iam_role_permissions(rs_conn)
-        load_data_into_redshift(rs_conn)
+        if LOAD_MODE == "append":
+            append_data_into_redshift(rs_conn)
+        else:
+            load_data_into_redshift(rs_conn)
         logger.info("Data load completed successfully")
+        maintain_tables(rs_conn)
     except Exception as e:
         logger.error(f"Data load process failed: {e}")
         sys.exit(1)
 
 
+def maintain_tables(rs_conn):
+    """Run post-load maintenance; failures are reported but do not fail the load"""
+    tables = [POSTS_TABLE, METRICS_TABLE] if LOAD_MODE == "append" else [TABLE_NAME]
+    tables.append(TICKERS_TABLE)
+    try:
+        report = run_maintenance(rs_conn, tables)
+        write_run_report(output_name, "table_maintenance", report)
+    except Exception as e:
+        logger.error(f"Table maintenance failed: {e}")
+
+
 def connect_to_redshift():
     """Connect to Redshift instance"""
     try:
@@ -331,12 +426,57 @@ def check_load_errors(conn):
         logger.error(f"Error checking load errors: {e}")
 
 
+def table_columns(cur, table):
+    """Column names of a table in the current schema; empty if it does not exist"""
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s;",
+        (table,)
+    )
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate_posts_table(cur):
+    """
+    Bring a reddit_posts table created by an earlier version of this loader up to date;
+    runs in the load transaction, after lock_dimensions
+    """
+    columns = table_columns(cur, POSTS_TABLE)
+    if not columns:
+        return
+    if "cluster_id" not in columns:
+        logger.info(f"Adding cluster_id to {POSTS_TABLE}")
+        cur.execute(sql_add_cluster_id)
+    if {"author", "subreddit"} <= columns:
+        logger.info(f"Migrating {POSTS_TABLE} to author and subreddit keys")
+        for dimension in (AUTHORS, SUBREDDITS):
+            dimension.assign_keys(cur, POSTS_TABLE)
+        cur.execute(sql_migrate_posts_table)
+
+
+def load_tickers(cur):
+    """Replace the tickers of the staged posts with the run's post -> ticker table"""
+    cur.execute(sql_create_tickers_table)
+    cur.execute(create_tickers_temp_table)
+    logger.info(f"Copying data from {tickers_file_path} to ticker staging table")
+    cur.execute(sql_copy_tickers_to_temp)
+    cur.execute(delete_staged_tickers)
+    cur.execute(insert_tickers)
+    logger.info(f"Inserted {cur.rowcount} post/ticker rows into {TICKERS_TABLE}")
+    cur.execute(drop_tickers_temp_table)
+
+
 def load_data_into_redshift(rs_conn):
     """Load data from S3 into Redshift"""
     try:
+        with rs_conn:
+            create_dimensions(rs_conn.cursor())
+
         with rs_conn:
             cur = rs_conn.cursor()
             
+            # Lock the dimensions before this transaction reads anything, see dimension_keys.py
+            lock_dimensions(cur)
+            
             # Create main table if not exists
             logger.info("Creating or verifying main table structure")
             cur.execute(sql_create_table)
@@ -354,6 +494,10 @@ def load_data_into_redshift(rs_conn):
             staging_count = cur.fetchone()[0]
             logger.info(f"Loaded {staging_count} rows into staging table")
             
+            # Give authors and subreddits seen for the first time a key
+            dimension_counts = assign_staged_keys(cur)
+            logger.info(f"Staged rows reference {dimension_counts[AUTHORS.table]} authors and {dimension_counts[SUBREDDITS.table]} subreddits")
+            
             # Delete existing records with same IDs
             logger.info("Removing existing records with same IDs from main table")
             cur.execute(delete_from_table)
@@ -367,6 +511,9 @@ def load_data_into_redshift(rs_conn):
             final_count = cur.fetchone()[0]
             logger.info(f"Main table now has {final_count} rows")
             
+            # Load the post -> ticker table for the same posts
+            load_tickers(cur)
+            
             # Drop staging table
             logger.info("Dropping staging table")
             cur.execute(drop_temp_table)
@@ -381,5 +528,66 @@ def load_data_into_redshift(rs_conn):
         raise
 
 
+def append_data_into_redshift(rs_conn):
+    """Load data from S3 into Redshift without deleting anything"""
+    try:
+        with rs_conn:
+            create_dimensions(rs_conn.cursor())
+
+        with rs_conn:
+            cur = rs_conn.cursor()
+            
+            # Lock the dimensions before this transaction reads anything, see dimension_keys.py
+            lock_dimensions(cur)
+            
+            # Create append-only tables and latest view if not exists
+            logger.info("Creating or verifying post and metrics tables")
+            migrate_posts_table(cur)
+            cur.execute(sql_create_posts_table)
+            cur.execute(sql_create_metrics_table)
+            cur.execute(sql_create_latest_view)
+            
+            # Create temporary staging table
+            logger.info("Creating temporary staging table")
+            cur.execute(create_temp_table)
+            
+            # Copy data from S3 to staging table
+            logger.info(f"Copying data from {file_path} to staging table")
+            cur.execute(sql_copy_to_temp)
+            
+            # Get staging table row count
+            cur.execute("SELECT COUNT(*) FROM our_staging_table")
+            staging_count = cur.fetchone()[0]
+            logger.info(f"Loaded {staging_count} rows into staging table")
+            
+            # Give authors and subreddits seen for the first time a key
+            dimension_counts = assign_staged_keys(cur)
+            logger.info(f"Staged rows reference {dimension_counts[AUTHORS.table]} authors and {dimension_counts[SUBREDDITS.table]} subreddits")
+            
+            # Store attributes of posts seen for the first time
+            cur.execute(insert_new_posts)
+            logger.info(f"Inserted {cur.rowcount} new posts into {POSTS_TABLE}")
+            
+            # Append this observation of every post's metrics
+            cur.execute(append_metrics)
+            logger.info(f"Appended {cur.rowcount} observations to {METRICS_TABLE}")
+            
+            # Load the post -> ticker table for the same posts
+            load_tickers(cur)
+            
+            # Drop staging table
+            logger.info("Dropping staging table")
+            cur.execute(drop_temp_table)
+            
+            # Commit transaction
+            rs_conn.commit()
+            logger.info("Transaction committed successfully")
+            
+    except Exception as e:
+        logger.error(f"Error appending data into Redshift: {e}")
+        check_load_errors(rs_conn)
+        raise
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,73 @@
+import logging
+import pathlib
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+"""
+Handoff files between pipeline stages running on the same worker. Stages write Arrow IPC
+(.arrow) files, which the next stage memory-maps instead of parsing CSV again; CSV is only
+written at the S3 boundary by upload_to_s3.py. Without pyarrow installed, stages fall back
+to handing off CSV files as before.
+"""
+
+logger = logging.getLogger('stage_handoff')
+
+ARROW_SUFFIX = ".arrow"
+
+# Rows per record batch, so consumers can stream a large file batch by batch
+BATCH_ROWS = 10000
+
+
+def handoff_path(path: str) -> str:
+    """Path a stage output will actually be written to, given pyarrow availability"""
+    if pathlib.Path(path).suffix == ARROW_SUFFIX and pa is None:
+        return str(pathlib.Path(path).with_suffix(".csv"))
+    return path
+
+
+def write_stage_frame(df: pd.DataFrame, path: str) -> str:
+    """Write a stage output; .arrow paths are written as an Arrow IPC file"""
+    path = handoff_path(path)
+    if pathlib.Path(path).suffix != ARROW_SUFFIX:
+        df.to_csv(path, index=False)
+        return path
+
+    # pandas' Arrow-backed string columns can arrive in many small chunks, and record
+    # batches split at chunk boundaries; combine so batches come out BATCH_ROWS long
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=BATCH_ROWS)
+    return path
+
+
+def iter_stage_batches(path: str):
+    """Yield record batches of an Arrow IPC file straight from the memory map"""
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+
+def read_stage_schema(path: str):
+    """Column names of an Arrow IPC file, without reading any data"""
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def read_stage_frame(path: str) -> pd.DataFrame:
+    """Read a stage output written by write_stage_frame, or a plain CSV"""
+    if pathlib.Path(path).suffix != ARROW_SUFFIX:
+        return pd.read_csv(path)
+    if pa is None:
+        raise ImportError(f"pyarrow is required to read {path}")
+
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas()
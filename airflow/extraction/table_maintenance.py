@@ -0,0 +1,145 @@
+import logging
+from typing import List, Dict, Any, Optional
+
+"""
+Post-load table maintenance. Reads table health from svv_table_info (Redshift) or
+pg_stat_user_tables (Postgres stand-in), runs VACUUM / ANALYZE only on tables that
+have crossed a threshold, and returns before/after numbers for the run report.
+"""
+
+logger = logging.getLogger('table_maintenance')
+
+# Percentages above which maintenance is triggered
+DEFAULT_THRESHOLDS = {
+    "unsorted_pct": 10.0,
+    "deleted_pct": 10.0,
+    "stats_off_pct": 10.0,
+}
+
+redshift_health_query = """
+SELECT "table", tbl_rows, estimated_visible_rows, unsorted, stats_off, skew_rows, size
+FROM svv_table_info
+WHERE "table" IN %s;
+"""
+
+postgres_health_query = """
+SELECT relname, n_live_tup, n_dead_tup, n_mod_since_analyze,
+       pg_total_relation_size(relid) / (1024 * 1024)
+FROM pg_stat_user_tables
+WHERE relname IN %s;
+"""
+
+
+def is_redshift(conn) -> bool:
+    """Redshift reports itself in version(); anything else is treated as Postgres"""
+    cur = conn.cursor()
+    cur.execute("SELECT version();")
+    return "redshift" in cur.fetchone()[0].lower()
+
+
+def _pct(part, whole) -> float:
+    if not whole:
+        return 0.0
+    return round(100.0 * float(part) / float(whole), 2)
+
+
+def table_health(conn, tables: List[str], redshift: bool) -> Dict[str, Dict[str, Any]]:
+    """Return health numbers for each table, using the same keys on both engines"""
+    health = {}
+    if not tables:
+        return health
+
+    cur = conn.cursor()
+    if redshift:
+        cur.execute(redshift_health_query, (tuple(tables),))
+        for table, tbl_rows, visible_rows, unsorted, stats_off, skew_rows, size in cur.fetchall():
+            health[table.strip()] = {
+                "rows": visible_rows,
+                "deleted_pct": _pct((tbl_rows or 0) - (visible_rows or 0), tbl_rows),
+                "unsorted_pct": float(unsorted) if unsorted is not None else None,
+                "stats_off_pct": float(stats_off) if stats_off is not None else None,
+                "skew_rows": float(skew_rows) if skew_rows is not None else None,
+                "size_mb": size,
+            }
+    else:
+        # This backend's own changes, such as the load that just ran, only show up in
+        # pg_stat_user_tables once its pending statistics are flushed (Postgres 15+)
+        if conn.server_version >= 150000:
+            cur.execute("SELECT pg_stat_force_next_flush();")
+        # Postgres has no sort order or slices, so unsorted and skew are not applicable
+        cur.execute(postgres_health_query, (tuple(tables),))
+        for table, live, dead, modified, size in cur.fetchall():
+            health[table] = {
+                "rows": live,
+                "deleted_pct": _pct(dead, live + dead),
+                "unsorted_pct": None,
+                "stats_off_pct": _pct(modified, live),
+                "skew_rows": None,
+                "size_mb": size,
+            }
+
+    for table in tables:
+        if table not in health:
+            # svv_table_info only lists tables that hold data
+            logger.info(f"No health information for {table}, skipping")
+    return health
+
+
+def plan_maintenance(table: str, health: Dict[str, Any], redshift: bool, thresholds: Dict[str, float]) -> List[str]:
+    """Decide which maintenance statements a table needs"""
+    needs_delete = health["deleted_pct"] > thresholds["deleted_pct"]
+    needs_sort = (health["unsorted_pct"] or 0) > thresholds["unsorted_pct"]
+    needs_analyze = (health["stats_off_pct"] or 0) > thresholds["stats_off_pct"]
+
+    actions = []
+    if redshift:
+        if needs_delete and needs_sort:
+            actions.append(f"VACUUM FULL {table};")
+        elif needs_delete:
+            actions.append(f"VACUUM DELETE ONLY {table};")
+        elif needs_sort:
+            actions.append(f"VACUUM SORT ONLY {table};")
+    elif needs_delete:
+        actions.append(f"VACUUM {table};")
+
+    # A vacuum moves rows around, so refresh statistics after it as well
+    if needs_analyze or actions:
+        actions.append(f"ANALYZE {table};")
+    return actions
+
+
+def run_maintenance(conn, tables: List[str], thresholds: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Vacuum/analyze tables past their thresholds and report health before and after"""
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+
+    # VACUUM cannot run inside a transaction block, so every statement here runs on its own
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        redshift = is_redshift(conn)
+        before = table_health(conn, tables, redshift)
+        report = {
+            "engine": "redshift" if redshift else "postgres",
+            "thresholds": thresholds,
+            "tables": {},
+        }
+
+        cur = conn.cursor()
+        for table, health in before.items():
+            actions = plan_maintenance(table, health, redshift, thresholds)
+            for statement in actions:
+                logger.info(f"Running {statement}")
+                cur.execute(statement)
+            if not actions:
+                logger.info(f"{table} is healthy, no maintenance needed")
+            report["tables"][table] = {"before": health, "actions": actions}
+
+        after = table_health(conn, list(report["tables"]), redshift)
+    finally:
+        conn.autocommit = previous_autocommit
+
+    for table, entry in report["tables"].items():
+        entry["after"] = after.get(table)
+        logger.info(f"{table} health before: {entry['before']}, after: {entry['after']}")
+
+    return report
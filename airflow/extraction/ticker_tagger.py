@@ -0,0 +1,308 @@
+import argparse
+import csv
+import glob
+import logging
+import pathlib
+import random
+import re
+import string
+import sys
+import time
+from collections import Counter
+from typing import List, Dict, Tuple, Optional
+
+import pandas as pd
+
+from stage_handoff import read_stage_frame, write_stage_frame
+
+"""
+Tag posts with the stock tickers they mention. Builds a single matcher from a symbol
+dictionary (symbol, company name, optional aliases) and scans each post's title and
+selftext once, producing a normalized post -> ticker table.
+
+Matching is done on tokens rather than characters: one compiled regex splits the text,
+then each token is looked up in a hash of symbols and walked through a trie of company
+names (at most a few steps per token, however large the dictionary). Three kinds of
+mention are recognised:
+  - cashtags, e.g. $TSLA, for any symbol in the dictionary
+  - bare symbols written in upper case, e.g. TSLA, except very short symbols and
+    symbols that are also common upper case words (CEO, ETF, IT, ...)
+  - company names and aliases, e.g. "Tesla" or "Bank of America"; single word names
+    must be capitalised so that "target" or "visa" in running text are not tagged
+
+Run `python ticker_tagger.py --benchmark` to measure throughput against a synthetic
+dictionary of 10k+ symbols.
+"""
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('ticker_tagger')
+
+script_path = pathlib.Path(__file__).parent.resolve()
+DEFAULT_SYMBOLS_PATH = f"{script_path}/symbols.csv"
+
+TOKEN_RE = re.compile(r"\$?[A-Za-z][A-Za-z0-9&]*(?:['’.\-][A-Za-z0-9&]+)*")
+
+# Upper case words that are also listed symbols; these still match as cashtags
+AMBIGUOUS_SYMBOLS = {
+    "A", "I", "AI", "ALL", "AM", "ARE", "AT", "ATH", "BE", "BIG", "CAN", "CEO", "CFO",
+    "DD", "EOD", "EPS", "ETF", "EU", "EV", "FED", "FOMO", "FOR", "GDP", "GO", "HAS",
+    "HOLD", "IMO", "IPO", "IT", "LOW", "NEW", "NOW", "ON", "ONE", "OR", "OUT", "PM",
+    "RH", "SEC", "SO", "TV", "UK", "US", "USA", "YOLO", "YOY",
+}
+MIN_BARE_SYMBOL_LENGTH = 2
+
+# Legal and share class words dropped from the end of company names
+NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "companies", "ltd",
+    "limited", "plc", "holding", "holdings", "group", "sa", "s.a", "nv", "n.v", "ag",
+    "se", "lp", "llc", "and", "&", "the",
+}
+NAME_NOISE_RE = re.compile(
+    r"\s+-\s+.*$|\bclass [a-z]\b|\ba/s\b|\bcommon stock\b|\bordinary shares\b|\bdepositary shares\b",
+    re.IGNORECASE,
+)
+MIN_NAME_LENGTH = 3
+
+NAME_END = None  # trie key marking the end of a company name
+
+POSSESSIVE_SUFFIXES = ("'s", "’s", "'S", "’S")
+
+
+def strip_possessive(token: str) -> str:
+    """Drop a trailing possessive, e.g. AMD's -> AMD"""
+    return token[:-2] if token.endswith(POSSESSIVE_SUFFIXES) else token
+
+
+def normalize_token(token: str) -> str:
+    """Lower case a token and drop a trailing possessive"""
+    return strip_possessive(token.lower())
+
+
+def name_tokens(name: str) -> List[str]:
+    """Tokens of a company name with share class and legal suffixes removed"""
+    tokens = [normalize_token(t) for t in TOKEN_RE.findall(NAME_NOISE_RE.sub("", name))]
+    while tokens and tokens[-1] in NAME_SUFFIXES:
+        tokens.pop()
+    while tokens and tokens[0] == "the":
+        tokens.pop(0)
+    return tokens
+
+
+def load_symbol_dictionary(path: str = DEFAULT_SYMBOLS_PATH) -> List[Tuple[str, str, List[str]]]:
+    """
+    Read (symbol, name, aliases) from a delimited file with a header row. Accepts our
+    symbols.csv (symbol,name,aliases) as well as exchange listings such as
+    nasdaqtraded.txt (Symbol|Security Name|...).
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=",|\t;")
+        reader = csv.DictReader(f, dialect=dialect)
+        columns = {c.lower().strip(): c for c in reader.fieldnames}
+        symbol_col = columns.get("symbol")
+        name_col = columns.get("name") or columns.get("security name") or columns.get("company name")
+        alias_col = columns.get("aliases")
+        if symbol_col is None or name_col is None:
+            raise ValueError(f"{path} needs a symbol and a name column, found {reader.fieldnames}")
+
+        entries = []
+        for row in reader:
+            symbol = (row.get(symbol_col) or "").strip().upper()
+            if not symbol or symbol.startswith("FILE CREATION TIME"):
+                continue
+            aliases = [a.strip() for a in (row.get(alias_col) or "").split(";") if a.strip()] if alias_col else []
+            entries.append((symbol, (row.get(name_col) or "").strip(), aliases))
+
+    logger.info(f"Loaded {len(entries)} symbols from {path}")
+    return entries
+
+
+class TickerMatcher:
+    """Precompiled multi-pattern matcher over a symbol dictionary"""
+
+    def __init__(self, entries: List[Tuple[str, str, List[str]]]):
+        self.symbols = set()
+        self.bare_symbols = set()
+        self.name_trie = {}
+        self.max_name_tokens = 1
+
+        for symbol, name, aliases in entries:
+            self.symbols.add(symbol)
+            if len(symbol) >= MIN_BARE_SYMBOL_LENGTH and symbol not in AMBIGUOUS_SYMBOLS:
+                self.bare_symbols.add(symbol)
+            for company_name in [name] + list(aliases):
+                self._add_name(company_name, symbol)
+
+    def _add_name(self, company_name: str, symbol: str):
+        tokens = name_tokens(company_name)
+        if not tokens or len("".join(tokens)) < MIN_NAME_LENGTH or tokens == [symbol.lower()]:
+            return
+        node = self.name_trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        # The first entry for a name wins, e.g. a primary listing over a later share class
+        node.setdefault(NAME_END, symbol)
+        self.max_name_tokens = max(self.max_name_tokens, len(tokens))
+
+    def find(self, text: str) -> Counter:
+        """Count mentions of each symbol in text"""
+        mentions = Counter()
+        if not text:
+            return mentions
+
+        tokens = TOKEN_RE.findall(text)
+        lowered = [normalize_token(t) for t in tokens]
+        symbols, bare_symbols, trie = self.symbols, self.bare_symbols, self.name_trie
+        i, n = 0, len(tokens)
+        while i < n:
+            token = strip_possessive(tokens[i])
+            if token[0] == "$":
+                symbol = token[1:].upper()
+                if symbol in symbols:
+                    mentions[symbol] += 1
+                i += 1
+                continue
+
+            if token in bare_symbols:
+                mentions[token] += 1
+                i += 1
+                continue
+
+            # Longest company name starting at this token
+            node, matched, matched_end = trie, None, i
+            j = i
+            while j < n and j - i < self.max_name_tokens:
+                node = node.get(lowered[j])
+                if node is None:
+                    break
+                j += 1
+                if NAME_END in node:
+                    matched, matched_end = node[NAME_END], j
+            if matched is not None and (matched_end - i > 1 or token[0].isupper()):
+                mentions[matched] += 1
+                i = matched_end
+                continue
+            i += 1
+
+        return mentions
+
+
+def tag_tickers(df: pd.DataFrame, matcher: TickerMatcher) -> pd.DataFrame:
+    """Build the post -> ticker table: one row per (post id, ticker) with mention counts"""
+    logger.info(f"Tagging tickers in {len(df)} posts")
+    columns = ["id", "ticker", "mentions", "in_title"]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    titles = df["title"].fillna("") if "title" in df.columns else [""] * len(df)
+    selftexts = df["selftext"].fillna("") if "selftext" in df.columns else [""] * len(df)
+
+    rows = []
+    for post_id, title, selftext in zip(df["id"], titles, selftexts):
+        title_mentions = matcher.find(title)
+        mentions = title_mentions + matcher.find(selftext)
+        for ticker in sorted(mentions):
+            rows.append((post_id, ticker, mentions[ticker], ticker in title_mentions))
+
+    tickers_df = pd.DataFrame(rows, columns=columns)
+    logger.info(f"Found {len(tickers_df)} post/ticker pairs across {tickers_df['id'].nunique()} posts")
+    return tickers_df
+
+
+def _synthetic_entries(count: int, seed: int = 42) -> List[Tuple[str, str, List[str]]]:
+    """Random but realistic looking symbols and company names for benchmarking"""
+    rng = random.Random(seed)
+    words = ["global", "american", "united", "first", "pacific", "energy", "bio", "health",
+             "systems", "capital", "financial", "networks", "dynamics", "resources", "therapeutics",
+             "semiconductor", "software", "motors", "foods", "pharma", "industries", "labs", "solar"]
+    entries, seen = [], set()
+    while len(entries) < count:
+        symbol = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(2, 5)))
+        if symbol in seen:
+            continue
+        seen.add(symbol)
+        stem = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))).capitalize()
+        name = " ".join([stem] + rng.sample(words, rng.randint(0, 2)) + ["Inc."])
+        entries.append((symbol, name, []))
+    return entries
+
+
+def run_benchmark(symbol_count: int = 12000, post_count: int = 50000, target_per_hour: int = 1000000) -> Dict[str, float]:
+    """Time matcher build and tagging; posts are sampled from the CSVs in tmp/"""
+    entries = load_symbol_dictionary() + _synthetic_entries(symbol_count)
+
+    start = time.perf_counter()
+    matcher = TickerMatcher(entries)
+    build_seconds = time.perf_counter() - start
+
+    samples = []
+    for path in sorted(glob.glob(str(script_path.parents[1] / "tmp" / "*.csv"))):
+        samples.append(pd.read_csv(path, usecols=["title", "selftext"]))
+    if samples:
+        sample_df = pd.concat(samples, ignore_index=True).fillna("")
+    else:
+        sample_df = pd.DataFrame({"title": ["Tesla (TSLA) beats estimates, $NVDA falls"], "selftext": [""]})
+    repeats = post_count // len(sample_df) + 1
+    posts = pd.concat([sample_df] * repeats, ignore_index=True).iloc[:post_count]
+    posts.insert(0, "id", range(len(posts)))
+    text_mb = (posts["title"].str.len().sum() + posts["selftext"].str.len().sum()) / 1e6
+
+    start = time.perf_counter()
+    tickers_df = tag_tickers(posts, matcher)
+    tag_seconds = time.perf_counter() - start
+
+    posts_per_hour = len(posts) / tag_seconds * 3600
+    results = {
+        "symbols": len(matcher.symbols),
+        "posts": len(posts),
+        "text_mb": round(text_mb, 1),
+        "build_seconds": round(build_seconds, 3),
+        "tag_seconds": round(tag_seconds, 3),
+        "posts_per_second": round(len(posts) / tag_seconds),
+        "posts_per_hour": round(posts_per_hour),
+        "mb_per_second": round(text_mb / tag_seconds, 2),
+        "pairs_found": len(tickers_df),
+    }
+    for key, value in results.items():
+        logger.info(f"{key}: {value}")
+    if posts_per_hour >= target_per_hour:
+        logger.info(f"PASS: {posts_per_hour:,.0f} posts/hour >= target of {target_per_hour:,}")
+    else:
+        logger.warning(f"FAIL: {posts_per_hour:,.0f} posts/hour < target of {target_per_hour:,}")
+    return results
+
+
+def main(input_path: str, output_path: Optional[str] = None, symbols_path: str = DEFAULT_SYMBOLS_PATH) -> pd.DataFrame:
+    """Tag an extracted CSV or Arrow file and save the post -> ticker table"""
+    if output_path is None:
+        input_file = pathlib.Path(input_path)
+        output_path = str(input_file.with_suffix("")) + f"_tickers{input_file.suffix}"
+    matcher = TickerMatcher(load_symbol_dictionary(symbols_path))
+    tickers_df = tag_tickers(read_stage_frame(input_path), matcher)
+    output_path = write_stage_frame(tickers_df, output_path)
+    logger.info(f"Saved ticker mentions to {output_path}")
+    return tickers_df
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Tag Reddit posts with ticker mentions")
+    arg_parser.add_argument("input_path", nargs="?", help="extracted CSV or Arrow file to tag")
+    arg_parser.add_argument("output_path", nargs="?", help="defaults to <input>_tickers with the input suffix")
+    arg_parser.add_argument("--symbols", default=DEFAULT_SYMBOLS_PATH, help="symbol dictionary file")
+    arg_parser.add_argument("--benchmark", action="store_true", help="measure tagging throughput")
+    arg_parser.add_argument("--benchmark-symbols", type=int, default=12000)
+    arg_parser.add_argument("--benchmark-posts", type=int, default=50000)
+    args = arg_parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark_symbols, args.benchmark_posts)
+    elif args.input_path:
+        main(args.input_path, args.output_path, args.symbols)
+    else:
+        arg_parser.print_usage()
+        sys.exit(1)
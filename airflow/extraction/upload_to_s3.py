@@ -6,11 +6,23 @@ import sys
 import os
 import logging
 from datetime import datetime
+from validate_csv import validate_file
+from run_report import write_run_report
+from s3_compression import DEFAULT_CODEC, check_codec, compress_file, s3_key
+from stage_handoff import read_stage_frame
+import ticker_tagger
 
 """
 Part of DAG. Take Reddit data and upload to S3 bucket.
-Takes one command line argument of format YYYYMMDD.
-This represents the file downloaded from Reddit.
+Takes one command line argument of format YYYYMMDD (or YYYYMMDD_HHMM from the polling
+DAG), defaulting to today's date. This represents the file downloaded from Reddit.
+The extract is read from its Arrow handoff file (or CSV) and validated locally;
+only rows that will load cleanly into Redshift are written to the CSV that is
+uploaded, the rest are left in a quarantine file next to it.
+The uploaded CSV is compressed with the codec set by `compression` in [aws_config]
+(gzip by default, see s3_compression.py) and stored as <YYYYMMDD>.csv.gz etc.
+The run's post -> ticker table goes up next to it as <YYYYMMDD>_tickers.csv.gz; extracts
+saved without one are tagged here first.
 """
 
 # Set up logging
@@ -24,7 +36,8 @@ logger = logging.getLogger('reddit_extractor')
 
 parser = configparser.ConfigParser()
 script_path = pathlib.Path(__file__).parent.resolve()
-config_path = f"{script_path}/configuration.conf"
+config_path = os.environ.get("REDDIT_ETL_CONFIG", f"{script_path}/configuration.conf")
+DATA_DIR = os.environ.get("REDDIT_ETL_DATA_DIR", "/Users/dharmatejasamudrala/reddit-etl/tmp")
 
 
 if not os.path.exists(config_path):
@@ -36,22 +49,37 @@ BUCKET_NAME = parser.get("aws_config", "bucket_name")
 AWS_REGION = parser.get("aws_config", "aws_region")
 aws_access_key_id = parser.get("aws_config", "aws_access_key_id")
 aws_secret_access_key = parser.get("aws_config", "aws_secret_access_key")
+# Set to point at an S3-compatible stand-in such as MinIO
+S3_ENDPOINT_URL = parser.get("aws_config", "s3_endpoint_url", fallback=None)
+COMPRESSION = parser.get("aws_config", "compression", fallback=DEFAULT_CODEC)
 # Get filename from command line or use default
 
-current_date = datetime.now().strftime('%Y%m%d')
-print("Command line argument not provided, using current date '{current_date}'")
-output_name = current_date
+try:
+    output_name = sys.argv[1]
+    logger.info(f"Using command line argument for filename: {output_name}")
+except IndexError:
+    current_date = datetime.now().strftime('%Y%m%d')
+    print(f"Command line argument not provided, using current date '{current_date}'")
+    output_name = current_date
 
 # Name for our S3 file
-FILENAME = f"{output_name}.csv"
-KEY = FILENAME
+try:
+    COMPRESSION = check_codec(COMPRESSION)
+except Exception as e:
+    print(f"Invalid compression setting: {e}")
+    sys.exit(1)
+KEY = s3_key(output_name, COMPRESSION)
+TICKERS_KEY = s3_key(f"{output_name}_tickers", COMPRESSION)
 
 def main():
     print("in main")
     """Upload input file to S3 bucket"""
     try:
         # Source file path - adjust this to where your file is actually located
-        source_file_path = f"/Users/dharmatejasamudrala/reddit-etl/tmp/{output_name}.csv"
+        source_file_path = f"{DATA_DIR}/{output_name}.arrow"
+        if not os.path.exists(source_file_path):
+            # Extracted without pyarrow, or an older CSV extract
+            source_file_path = f"{DATA_DIR}/{output_name}.csv"
         
         if  os.path.exists(source_file_path):
             print("file path okay")
@@ -61,21 +89,51 @@ def main():
         if not os.path.exists(source_file_path):
             print(f"Error: File not found at {source_file_path}")
             sys.exit(1)
+
+        # Validate locally so bad rows never reach S3 or Redshift
+        report = validate_file(source_file_path)
+        write_run_report(output_name, "validation", report)
+        valid_file_path = report["output_path"]
+        if report["rows_rejected"]:
+            logger.warning(f"{report['rows_rejected']} rows quarantined in {report['quarantine_path']}")
+
+        # Compress once locally; Redshift decompresses during COPY
+        compression = compress_file(valid_file_path, COMPRESSION)
+        write_run_report(output_name, "compression", compression)
+        upload_path = compression["output_path"]
+        logger.info(f"Compressed with {COMPRESSION}: {compression['raw_bytes']} -> {compression['compressed_bytes']} bytes")
             
+        tickers_upload_path = compress_file(tickers_csv(source_file_path), COMPRESSION)["output_path"]
+
         conn = connect_to_s3()
-        create_bucket_if_not_exists(conn , source_file_path)
-        upload_file_to_s3(conn, source_file_path)
-        print(f"Successfully uploaded {source_file_path} to s3://{BUCKET_NAME}/{KEY}")
+        create_bucket_if_not_exists(conn , upload_path)
+        upload_file_to_s3(conn, upload_path)
+        print(f"Successfully uploaded {upload_path} to s3://{BUCKET_NAME}/{KEY}")
+        upload_file_to_s3(conn, tickers_upload_path, TICKERS_KEY)
+        print(f"Successfully uploaded {tickers_upload_path} to s3://{BUCKET_NAME}/{TICKERS_KEY}")
     except Exception as e:
         print(f"An error occurred at: {e}")
         sys.exit(1)
 
+def tickers_csv(source_file_path):
+    """CSV of the post -> ticker table saved next to the extract, tagging the extract if there is none"""
+    source = pathlib.Path(source_file_path)
+    tickers_path = pathlib.Path(f"{source.with_suffix('')}_tickers{source.suffix}")
+    csv_path = tickers_path.with_suffix(".csv")
+    if tickers_path != csv_path and tickers_path.exists():
+        read_stage_frame(str(tickers_path)).to_csv(csv_path, index=False)
+    elif not csv_path.exists():
+        logger.info(f"No ticker table for {source_file_path}, tagging it now")
+        ticker_tagger.main(source_file_path, str(csv_path))
+    return str(csv_path)
+
 def connect_to_s3():
     """Connect to S3 Instance"""
     try:
         # Include region in the connection
         conn = boto3.resource("s3", aws_access_key_id=aws_access_key_id,
-    aws_secret_access_key=aws_secret_access_key,region_name=AWS_REGION)
+    aws_secret_access_key=aws_secret_access_key,region_name=AWS_REGION,
+    endpoint_url=S3_ENDPOINT_URL)
         logger.info("Sucessfully connected to S3")
         return conn
     except Exception as e:
@@ -109,11 +167,11 @@ def create_bucket_if_not_exists(conn, file_path):
             sys.exit(1)
     logger.info("Sucessfully created bucket ")
 
-def upload_file_to_s3(conn, file_path):
+def upload_file_to_s3(conn, file_path, key=KEY):
     """Upload file to S3 Bucket"""
     try:
         conn.meta.client.upload_file(
-            Filename=file_path, Bucket=BUCKET_NAME, Key=KEY
+            Filename=file_path, Bucket=BUCKET_NAME, Key=key
         )
         logger.info("Sucessfully Uploaded to S3")
     except botocore.exceptions.ClientError as e:
@@ -0,0 +1,435 @@
+import csv
+import logging
+import pathlib
+import sys
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from stage_handoff import ARROW_SUFFIX, iter_stage_batches, read_stage_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv
+except ImportError:
+    pa = None
+
+"""
+Part of DAG. Validate an extracted CSV (or Arrow handoff file) locally before it is uploaded to S3.
+Streams the file once, checking the header against the columns of our_staging_table
+in s3_to_redshift.py, and each value against its column type, varchar byte limit and
+encoding. Rows that would be rejected or silently mangled by COPY are written to a
+quarantine file instead, so Redshift only ever receives rows that load cleanly.
+Arrow handoff files are checked column by column with pyarrow.compute, and only the
+valid rows of each batch are serialized to CSV.
+Over-long title/selftext values are not a reason to drop a post: they are truncated to
+the column's byte limit on a character boundary, as TRUNCATECOLUMNS would, and counted.
+Files extracted before a column was added (e.g. cluster_id) still validate: the missing
+trailing column is filled from the one named in FILLED_COLUMNS.
+"""
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('csv_validator')
+
+# Mirrors our_staging_table in s3_to_redshift.py - keep both in sync.
+# (column name, type, varchar length in bytes)
+STAGING_COLUMNS = [
+    ("id", "varchar", 100),
+    ("title", "varchar", 4000),
+    ("score", "int", None),
+    ("num_comments", "int", None),
+    ("author", "varchar", 100),
+    ("created_utc", "timestamp", None),
+    ("url", "varchar", 2000),
+    ("upvote_ratio", "float", None),
+    ("over_18", "varchar", 10),
+    ("spoiler", "varchar", 10),
+    ("stickied", "varchar", 10),
+    ("selftext", "varchar", 65535),
+    ("subreddit", "varchar", 100),
+    ("extraction_timestamp", "timestamp", None),
+    ("selftext_length", "int", None),
+    ("is_nsfw", "varchar", 10),
+    ("cluster_id", "varchar", 100),
+]
+
+# Free text columns where a quoted newline is expected; anywhere else it means a broken row
+MULTILINE_COLUMNS = {"title", "selftext"}
+
+# Free text columns cut to their byte limit instead of rejecting the row
+TRUNCATE_COLUMNS = {"title", "selftext"}
+
+# Columns that must be present on every row
+REQUIRED_COLUMNS = {"id"}
+
+# Columns older extracts lack -> column to fill them from. A post with no cluster
+# assignment is its own cluster.
+FILLED_COLUMNS = {"cluster_id": "id"}
+
+INT_MIN, INT_MAX = -2**31, 2**31 - 1
+
+# The csv module caps fields at 128KB by default; selftext can be larger
+csv.field_size_limit(sys.maxsize)
+
+
+def check_int(value: str) -> Optional[str]:
+    try:
+        number = int(value)
+    except ValueError:
+        # pandas writes integer columns holding NaN as floats, e.g. "12.0"
+        try:
+            as_float = float(value)
+        except ValueError:
+            return "not an integer"
+        if not as_float.is_integer():
+            return "not an integer"
+        number = int(as_float)
+    if not INT_MIN <= number <= INT_MAX:
+        return "integer out of range"
+    return None
+
+
+def check_float(value: str) -> Optional[str]:
+    try:
+        float(value)
+    except ValueError:
+        return "not a float"
+    return None
+
+
+def check_timestamp(value: str) -> Optional[str]:
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return "not a timestamp"
+    return None
+
+
+TYPE_CHECKS = {
+    "int": check_int,
+    "float": check_float,
+    "timestamp": check_timestamp,
+}
+
+
+def build_column_checks():
+    """Precompute a list of (name, check function, byte limit, multiline allowed) per column"""
+    checks = []
+    for name, col_type, length in STAGING_COLUMNS:
+        checks.append((name, TYPE_CHECKS.get(col_type), length, name in MULTILINE_COLUMNS))
+    return checks
+
+
+def truncate_utf8(value: str, length: int) -> str:
+    """Cut value to at most length UTF-8 bytes without splitting a character"""
+    return value.encode("utf-8")[:length].decode("utf-8", "ignore")
+
+
+def check_row(row, checks, truncated: Optional[list] = None) -> Optional[str]:
+    """
+    Return the first reason the row would not load cleanly, or None if it is valid.
+    Over-long free text is truncated in place and its column name appended to truncated;
+    integers written as floats are rewritten in place as integer text.
+    """
+    if len(row) != len(checks):
+        return f"expected {len(checks)} fields, got {len(row)}"
+
+    for i, (value, (name, type_check, length, multiline)) in enumerate(zip(row, checks)):
+        if value == "" or value.isspace():
+            # EMPTYASNULL / BLANKSASNULL turn these into NULL
+            if name in REQUIRED_COLUMNS:
+                return f"{name}: missing value"
+            continue
+
+        if "\x00" in value:
+            return f"{name}: NUL byte"
+
+        if not multiline and ("\n" in value or "\r" in value):
+            return f"{name}: embedded newline"
+
+        if type_check is not None:
+            reason = type_check(value.strip())
+            if reason:
+                return f"{name}: {reason}"
+            if type_check is check_int:
+                # COPY rejects "12.0" for an int column; write it as "12"
+                row[i] = str(int(float(value)))
+            continue
+
+        try:
+            encoded = value.encode("utf-8")
+        except UnicodeEncodeError:
+            # Undecodable input bytes survive as lone surrogates (surrogateescape)
+            return f"{name}: invalid UTF-8"
+        if length is not None and len(encoded) > length:
+            if name not in TRUNCATE_COLUMNS:
+                return f"{name}: {len(encoded)} bytes exceeds varchar({length})"
+            row[i] = truncate_utf8(value, length)
+            if truncated is not None:
+                truncated.append(name)
+
+    return None
+
+
+def _output_paths(input_path: str, output_path: str = None, quarantine_path: str = None):
+    source = pathlib.Path(input_path)
+    if output_path is None:
+        output_path = str(source.with_suffix(".valid.csv"))
+    if quarantine_path is None:
+        quarantine_path = str(source.with_suffix(".rejected.csv"))
+    return output_path, quarantine_path
+
+
+def check_header(header):
+    """Columns to fill in (see FILLED_COLUMNS); raises if header does not match otherwise"""
+    expected_header = [name for name, _, _ in STAGING_COLUMNS]
+    missing = [name for name in expected_header if name not in (header or [])]
+    if header is None or header + missing != expected_header or not set(missing) <= FILLED_COLUMNS.keys():
+        raise ValueError(
+            f"CSV header does not match our_staging_table columns.\n"
+            f"Expected: {expected_header}\nFound:    {header}"
+        )
+    for name in missing:
+        logger.warning(f"No {name} column, filling it from {FILLED_COLUMNS[name]}")
+    return missing
+
+
+def fill_rows(header, missing, rows):
+    """Append the missing columns to each row; rows of the wrong width are left for check_row"""
+    sources = [header.index(FILLED_COLUMNS[name]) for name in missing]
+    for row in rows:
+        if len(row) == len(header):
+            row = row + [row[i] for i in sources]
+        yield row
+
+
+def _report(input_path, output_path, quarantine_path, rows_read, rows_valid, reasons, truncations) -> Dict[str, Any]:
+    """Log the outcome, drop an empty quarantine file and build the run report section"""
+    rows_rejected = rows_read - rows_valid
+    if rows_rejected:
+        logger.warning(f"Quarantined {rows_rejected} of {rows_read} rows to {quarantine_path}")
+        for column, count in reasons.most_common():
+            logger.warning(f"  {column}: {count} rows")
+    else:
+        pathlib.Path(quarantine_path).unlink()
+        quarantine_path = None
+    for column, count in truncations.items():
+        logger.warning(f"Truncated {column} to its byte limit on {count} rows")
+    logger.info(f"{rows_valid} valid rows written to {output_path}")
+
+    return {
+        "input_path": input_path,
+        "output_path": output_path,
+        "quarantine_path": quarantine_path,
+        "rows_read": rows_read,
+        "rows_valid": rows_valid,
+        "rows_rejected": rows_rejected,
+        "rejections_by_column": dict(reasons),
+        "truncations_by_column": dict(truncations),
+    }
+
+
+def validate_rows(header, rows, input_path: str, output_path: str, quarantine_path: str) -> Dict[str, Any]:
+    """Check each row of string values, writing loadable rows to output_path and rejects to quarantine_path"""
+    missing = check_header(header)
+    if missing:
+        rows = fill_rows(header, missing, rows)
+        header = header + missing
+
+    checks = build_column_checks()
+    reasons = Counter()
+    truncations = Counter()
+    rows_read = rows_valid = 0
+
+    with open(output_path, "w", newline="", encoding="utf-8") as outfile, \
+            open(quarantine_path, "w", newline="", encoding="utf-8", errors="surrogateescape") as rejectfile:
+        writer = csv.writer(outfile)
+        rejects = csv.writer(rejectfile)
+        writer.writerow(header)
+        rejects.writerow(["row", "reason"] + header)
+
+        for row in rows:
+            rows_read += 1
+            truncated = []
+            reason = check_row(row, checks, truncated)
+            if reason is None:
+                truncations.update(truncated)
+                writer.writerow(row)
+                rows_valid += 1
+            else:
+                reasons[reason.split(":")[0] if ":" in reason else reason] += 1
+                rejects.writerow([rows_read, reason] + row)
+
+    return _report(input_path, output_path, quarantine_path, rows_read, rows_valid, reasons, truncations)
+
+
+def validate_csv(input_path: str, output_path: str = None, quarantine_path: str = None) -> Dict[str, Any]:
+    """Stream a CSV file through the validator"""
+    output_path, quarantine_path = _output_paths(input_path, output_path, quarantine_path)
+    logger.info(f"Validating {input_path}")
+    with open(input_path, newline="", encoding="utf-8", errors="surrogateescape") as infile:
+        reader = csv.reader(infile)
+        header = next(reader, None)
+        return validate_rows(header, reader, input_path, output_path, quarantine_path)
+
+
+def _mask(result) -> np.ndarray:
+    """Boolean compute result as numpy, nulls counting as False"""
+    return pc.fill_null(result, False).to_numpy(zero_copy_only=False)
+
+
+def check_batch(batch, checks):
+    """
+    Vectorized check_row for one record batch. Returns the batch with over-long free text
+    truncated, one reason per row (None if valid) and the truncated column counts.
+    """
+    reasons = np.full(batch.num_rows, None, dtype=object)
+    truncations = Counter()
+    columns = list(batch.columns)
+
+    def flag(mask, reason):
+        unset = mask & (reasons == None)  # noqa: E711 - elementwise on an object array
+        if isinstance(reason, str):
+            reasons[unset] = reason
+        else:
+            for i in np.flatnonzero(unset):
+                reasons[i] = reason(i)
+
+    for position, (name, type_check, length, multiline) in enumerate(checks):
+        column = columns[position]
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            # EMPTYASNULL / BLANKSASNULL turn these into NULL
+            blank = _mask(pc.equal(pc.utf8_trim_whitespace(column), ""))
+            present = _mask(pc.is_valid(column)) & ~blank
+            if name in REQUIRED_COLUMNS:
+                flag(~present, f"{name}: missing value")
+            flag(present & _mask(pc.match_substring(column, "\x00")), f"{name}: NUL byte")
+            if not multiline:
+                flag(present & _mask(pc.match_substring_regex(column, "[\r\n]")), f"{name}: embedded newline")
+
+            if type_check is not None:
+                # Typed column that arrived as text; rare enough to check value by value
+                values = column.to_pylist()
+                bad = np.array([bool(p and type_check(v.strip())) for p, v in zip(present, values)], dtype=bool)
+                flag(bad, lambda i: f"{name}: {type_check(values[i].strip())}")
+            elif length is not None:
+                byte_lengths = pc.binary_length(column)
+                too_long = present & _mask(pc.greater(byte_lengths, length))
+                if name in TRUNCATE_COLUMNS and too_long.any():
+                    to_cut = np.flatnonzero(too_long & (reasons == None))  # noqa: E711
+                    values = column.to_pylist()
+                    for i in to_cut:
+                        values[i] = truncate_utf8(values[i], length)
+                    truncations[name] += len(to_cut)
+                    columns[position] = pa.array(values, type=column.type)
+                elif too_long.any():
+                    sizes = byte_lengths.to_numpy(zero_copy_only=False)
+                    flag(too_long, lambda i: f"{name}: {sizes[i]} bytes exceeds varchar({length})")
+
+        elif type_check is check_int and (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+            if pa.types.is_floating(column.type):
+                # pandas stores integer columns holding NaN as floats
+                flag(_mask(pc.not_equal(pc.floor(column), column)), f"{name}: not an integer")
+            out_of_range = pc.or_(pc.less(column, INT_MIN), pc.greater(column, INT_MAX))
+            flag(_mask(out_of_range), f"{name}: integer out of range")
+
+    batch = pa.RecordBatch.from_arrays(columns, schema=batch.schema)
+    return batch, reasons, truncations
+
+
+def csv_ready(batch):
+    """Render booleans and timestamps as the text pandas' to_csv writes, so both paths upload the same values"""
+    columns = []
+    for column in batch.columns:
+        if pa.types.is_boolean(column.type):
+            column = pc.if_else(column, "True", "False")
+        elif pa.types.is_timestamp(column.type):
+            # %S writes the fraction digits of the column's unit ("18.000000" for us), while
+            # pandas writes those of the coarsest unit that holds every value exactly
+            for unit in ("s", "ms", "us", "ns"):
+                try:
+                    column = pc.cast(column, pa.timestamp(unit))
+                    break
+                except pa.ArrowInvalid:
+                    continue
+            column = pc.strftime(column, format="%Y-%m-%d %H:%M:%S")
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+
+def validate_arrow(input_path: str, output_path: str = None, quarantine_path: str = None) -> Dict[str, Any]:
+    """
+    Validate an Arrow handoff file batch by batch on the Arrow columns. Each batch's valid
+    rows are serialized once, by Arrow's CSV writer, straight into the upload CSV; values
+    typed by Arrow (numbers, timestamps, booleans) need no parsing.
+    """
+    if pa is None:
+        raise ImportError(f"pyarrow is required to validate {input_path}")
+    output_path, quarantine_path = _output_paths(input_path, output_path, quarantine_path)
+    logger.info(f"Validating {input_path}")
+    header = read_stage_schema(input_path)
+    missing = check_header(header)
+    sources = [header.index(FILLED_COLUMNS[name]) for name in missing]
+    header = header + missing
+
+    checks = build_column_checks()
+    reasons, truncations = Counter(), Counter()
+    rows_read = rows_valid = 0
+
+    writer = None
+    with open(quarantine_path, "w", newline="", encoding="utf-8") as rejectfile:
+        csv.writer(rejectfile).writerow(["row", "reason"] + header)
+
+        for batch in iter_stage_batches(input_path):
+            for name, i in zip(missing, sources):
+                batch = batch.append_column(name, batch.column(i))
+            batch, row_reasons, batch_truncations = check_batch(batch, checks)
+            valid = row_reasons == None  # noqa: E711
+            truncations.update(batch_truncations)
+
+            valid_rows = csv_ready(batch.filter(pa.array(valid)))
+            if writer is None:
+                writer = pa.csv.CSVWriter(output_path, valid_rows.schema)
+            writer.write_batch(valid_rows)
+            if not valid.all():
+                rejected = batch.filter(pa.array(~valid)).to_pandas()
+                rejected.insert(0, "reason", row_reasons[~valid])
+                rejected.insert(0, "row", rows_read + 1 + np.flatnonzero(~valid))
+                rejected.to_csv(rejectfile, header=False, index=False)
+                reasons.update(r.split(":")[0] if ":" in r else r for r in row_reasons[~valid])
+
+            rows_read += batch.num_rows
+            rows_valid += int(valid.sum())
+
+    if writer is not None:
+        writer.close()
+    else:
+        with open(output_path, "w", newline="", encoding="utf-8") as outfile:
+            csv.writer(outfile).writerow(header)
+
+    return _report(input_path, output_path, quarantine_path, rows_read, rows_valid, reasons, truncations)
+
+
+def validate_file(input_path: str, output_path: str = None, quarantine_path: str = None) -> Dict[str, Any]:
+    """Validate a stage output, CSV or Arrow"""
+    if pathlib.Path(input_path).suffix == ARROW_SUFFIX:
+        return validate_arrow(input_path, output_path, quarantine_path)
+    return validate_csv(input_path, output_path, quarantine_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python validate_csv.py <input.csv|input.arrow> [output.csv] [quarantine.csv]")
+        sys.exit(1)
+    try:
+        validate_file(*sys.argv[1:4])
+    except Exception as e:
+        logger.error(f"Validation failed: {e}")
+        sys.exit(1)
@@ -1,10 +1,22 @@
 {{ config(materialized='table') }}
 
+WITH by_subreddit AS (
+    SELECT
+        subreddit_key,
+        COUNT(*) as post_count,
+        AVG(score) as avg_score,
+        AVG(num_comments) as avg_comments,
+        MAX(score) as max_score
+    FROM {{ ref('stg_reddit') }}
+    GROUP BY subreddit_key
+)
+
 SELECT
-    subreddit,
-    COUNT(*) as post_count,
-    AVG(score) as avg_score,
-    AVG(num_comments) as avg_comments,
-    MAX(score) as max_score
-FROM {{ ref('stg_reddit') }}
-GROUP BY subreddit
\ No newline at end of file
+    b.subreddit_key,
+    s.subreddit,
+    b.post_count,
+    b.avg_score,
+    b.avg_comments,
+    b.max_score
+FROM by_subreddit b
+LEFT JOIN {{ source('raw', 'reddit_subreddits') }} s ON s.subreddit_key = b.subreddit_key
\ No newline at end of file
@@ -1,13 +1,16 @@
 {{ config(materialized='view') }}
 
+-- posts_source follows load_mode in configuration.conf: the upsert load writes reddit,
+-- the append load (and the polling DAG) keeps each post's latest observation in reddit_post_latest
 SELECT
     id,
     title,
     score,
     num_comments,
-    author,
+    author_key,
     created_utc,
-    subreddit,
+    subreddit_key,
     selftext,
-    selftext_length
-FROM {{ source('raw', 'reddit') }}
\ No newline at end of file
+    selftext_length,
+    cluster_id
+FROM {{ source('raw', var('posts_source', 'reddit')) }}
\ No newline at end of file